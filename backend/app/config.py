@@ -1,11 +1,18 @@
 """Configuration settings for the Data QA Agent backend."""
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
 class Settings(BaseSettings):
     """Application settings."""
     
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True
+    )
+    
     # Application
     app_name: str = "Data QA Agent Backend"
     debug: bool = False
@@ -15,16 +22,38 @@ class Settings(BaseSettings):
     vertex_ai_location: str = "us-central1"
     vertex_ai_model: str = "gemini-2.5-flash"
     
+    # Test execution
+    max_mapping_concurrency: int = 8
+    max_test_query_concurrency: int = 16
+    # Reuse test query results while the target table is unmodified. Off by
+    # default: tests that read other tables (e.g. foreign keys) can go stale.
+    enable_result_cache: bool = False
+    # Always scan whole CSV files for the row count check instead of
+    # accepting a size-based estimate that is within 1% of the table
+    exact_row_count_always: bool = True
+    # Count CSV rows with a BigQuery query over the file instead of
+    # streaming it here. Faster for large files, but the scan is billed.
+    count_csv_with_bigquery: bool = False
+    # How long table/dataset metadata and existence checks are trusted;
+    # POST /api/cache/invalidate drops them sooner
+    metadata_cache_ttl_seconds: int = 300
+    # Skip a mapping's query tests when its row counts show the load failed
+    # outright: either side is empty, or the counts differ by more than this
+    # fraction of the file's rows. None (the default) always runs them.
+    catastrophic_diff_threshold: Optional[float] = None
+    
     # CORS
     cors_origins: list[str] = [
         "http://localhost:3000",
         "https://data-qa-agent-*.run.app",
         "https://data-qa-agent-frontend-750147355601.us-central1.run.app"
     ]
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide validated settings instance."""
+    return Settings()
+
+
+settings = get_settings()
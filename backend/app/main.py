@@ -1,35 +1,192 @@
 """Main FastAPI application for Data QA Agent backend."""
+import asyncio
+import datetime
+import functools
 import logging
-from fastapi import FastAPI, HTTPException
+import logging.handlers
+import queue
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from contextlib import aclosing, asynccontextmanager
+from pydantic import TypeAdapter
+import orjson
 
 from app.config import settings
 from app.models import (
     GenerateTestsRequest,
     GenerateTestsResponse,
-    ConfigTableResponse,
     HealthResponse,
     TestSummary,
     ConfigTableSummary,
-    CustomTestRequest
+    CustomTestRequest,
+    MappingResult,
+    TestResult
 )
+from app.services.bigquery_service import bigquery_service
+from app.services.http_client import close_shared_session
 from app.services.test_executor import test_executor
+from app.tests.predefined_tests import PREDEFINED_TESTS
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: while the app is running, request handlers only enqueue
+# records and a background listener thread formats and writes them. Outside
+# the lifespan (imports, scripts, shutdown) records are written directly.
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _log_stream_handler, respect_handler_level=True
+)
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.INFO)
+_root_logger.addHandler(_log_stream_handler)
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
 logger = logging.getLogger(__name__)
 
+# Serialize result lists in a single pass. Handlers return the output
+# wrapped in an ORJSONResponse so FastAPI doesn't walk it again with
+# jsonable_encoder.
+_mapping_results_adapter = TypeAdapter(List[MappingResult])
+_test_results_adapter = TypeAdapter(List[TestResult])
+
+# Tests run in single file mode when the request doesn't choose any
+DEFAULT_GCS_TESTS = ('row_count_match', 'no_nulls_required', 'no_duplicates_pk')
+
+# The logged details drop unset optional fields (usually None) to keep
+# history rows small; the HTTP response keeps the full shape.
+_LOG_DUMP_OPTIONS = {'mode': "json", 'exclude_none': True, 'exclude_defaults': True}
+
+# Execution history rows are queued by request handlers and written to
+# BigQuery in batches by a background task started in the lifespan.
+_EXECUTION_LOG_QUEUE_SIZE = 1000
+_EXECUTION_LOG_BATCH_SIZE = 50
+_EXECUTION_LOG_FLUSH_SECONDS = 1.0
+
+_execution_log_queue: Optional[asyncio.Queue] = None
+# Entries written directly while the batch writer isn't running, kept
+# referenced until their write finishes
+_direct_execution_logs: Set[asyncio.Task] = set()
+
+
+async def _write_execution_logs(batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+    """Write execution log entries, logging (not raising) a failure."""
+    try:
+        await bigquery_service.log_executions_bulk(batch)
+    except Exception as e:
+        logger.error(f"Failed to log {len(batch)} executions: {e}")
+
+
+async def _execution_log_writer(log_queue: asyncio.Queue) -> None:
+    """Drain queued execution logs, flushing on batch size or timeout."""
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        record = await log_queue.get()
+        if record is None:
+            break
+        batch = [record]
+        deadline = loop.time() + _EXECUTION_LOG_FLUSH_SECONDS
+        while len(batch) < _EXECUTION_LOG_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                record = await asyncio.wait_for(log_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if record is None:
+                stopping = True
+                break
+            batch.append(record)
+        await _write_execution_logs(batch)
+
+
+def _schedule_execution_log(project_id: str, execution_data: Dict[str, Any]) -> None:
+    """Queue an execution log entry so the response isn't held up by BigQuery."""
+    execution_data.setdefault(
+        "timestamp", datetime.datetime.now(datetime.timezone.utc).isoformat()
+    )
+    if _execution_log_queue is None:
+        # The batch writer only runs inside the lifespan (apps driven
+        # without it, or requests racing shutdown); write this one directly
+        logger.warning("Execution log writer not running; writing entry directly")
+        task = asyncio.get_running_loop().create_task(
+            _write_execution_logs([(project_id, execution_data)])
+        )
+        _direct_execution_logs.add(task)
+        task.add_done_callback(_direct_execution_logs.discard)
+        return
+    try:
+        _execution_log_queue.put_nowait((project_id, execution_data))
+    except asyncio.QueueFull:
+        logger.warning(
+            f"Execution log queue full, dropping {execution_data.get('comparison_mode')} entry"
+        )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown events."""
+    global _execution_log_queue
+    _log_listener.start()
+    _root_logger.removeHandler(_log_stream_handler)
+    _root_logger.addHandler(_log_queue_handler)
     logger.info("Starting Data QA Agent Backend...")
+    _execution_log_queue = asyncio.Queue(maxsize=_EXECUTION_LOG_QUEUE_SIZE)
+    writer = asyncio.create_task(_execution_log_writer(_execution_log_queue))
     yield
     logger.info("Shutting down Data QA Agent Backend...")
+    # Flush queued execution logs; the sentinel is placed after them
+    await _execution_log_queue.put(None)
+    await writer
+    _execution_log_queue = None
+    await bigquery_service.flush_inserts()
+    close_shared_session()
+    _root_logger.removeHandler(_log_queue_handler)
+    _root_logger.addHandler(_log_stream_handler)
+    # Flushes any queued records before the process exits
+    _log_listener.stop()
+
+
+def _summarize(results: List[TestResult]) -> TestSummary:
+    """Count test results by status in a single pass."""
+    counts = Counter(r.status for r in results)
+    return TestSummary(
+        total_tests=len(results),
+        passed=counts['PASS'],
+        failed=counts['FAIL'],
+        errors=counts['ERROR'],
+        skipped=counts['SKIPPED']
+    )
+
+
+# Liveness probes hit /health several times a second, so its response is
+# built once and served ahead of the rest of the middleware stack.
+_HEALTH_RESPONSE = ORJSONResponse(
+    HealthResponse(status="healthy", version="1.0.0").model_dump()
+)
+
+
+class HealthProbeMiddleware:
+    """ASGI middleware answering GET /health without entering the app."""
+    
+    def __init__(self, app, path: str = "/health"):
+        self.app = app
+        self.path = path
+    
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and scope["path"] == self.path
+            and scope["method"] == "GET"
+        ):
+            await _HEALTH_RESPONSE(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
 
 # Create FastAPI app
@@ -37,6 +194,7 @@ app = FastAPI(
     title=settings.app_name,
     description="AI-powered data quality testing for BigQuery and GCS",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -48,12 +206,185 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it runs first, before CORS
+app.add_middleware(HealthProbeMiddleware)
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
-    return HealthResponse(status="healthy", version="1.0.0")
+    """Health check endpoint (served by HealthProbeMiddleware for GET)."""
+    return _HEALTH_RESPONSE
+
+
+async def _handle_gcs_config(request: GenerateTestsRequest) -> ORJSONResponse:
+    """Config table mode: process multiple mappings from a config table."""
+    if not request.config_dataset or not request.config_table:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing required fields: config_dataset, config_table"
+        )
+    
+    result = await test_executor.process_config_table(
+        project_id=request.project_id,
+        config_dataset=request.config_dataset,
+        config_table=request.config_table
+    )
+    
+    summary_data = ConfigTableSummary(**result['summary']).model_dump(mode="json")
+    results_by_mapping = _mapping_results_adapter.dump_python(
+        result['results_by_mapping'], mode="json"
+    )
+
+    _log_config_execution(request, summary_data, result['results_by_mapping'])
+
+    return ORJSONResponse({
+        'summary': summary_data,
+        'results_by_mapping': results_by_mapping
+    })
+
+
+def _log_config_execution(
+    request: GenerateTestsRequest,
+    summary_data: Dict[str, Any],
+    results: List[MappingResult]
+) -> None:
+    """Queue the execution log entry for a config table run."""
+    try:
+        _schedule_execution_log(
+            project_id=request.project_id,
+            execution_data={
+                "comparison_mode": "gcs_config_table",
+                "source": f"{request.config_dataset}.{request.config_table}",
+                "target": "Multiple Targets",
+                "status": "AT_RISK" if summary_data['failed'] > 0 else "PASS",
+                "total_tests": summary_data['total_tests'],
+                "passed_tests": summary_data['passed'],
+                "failed_tests": summary_data['failed'],
+                "details": {
+                    "summary": summary_data,
+                    "results_by_mapping": _mapping_results_adapter.dump_python(
+                        results, **_LOG_DUMP_OPTIONS
+                    )
+                }
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to log config execution: {e}")
+
+
+async def _handle_gcs(request: GenerateTestsRequest) -> ORJSONResponse:
+    """GCS single file mode: compare one GCS file to a BigQuery table."""
+    if not all([request.gcs_bucket, request.gcs_file_path, 
+               request.target_dataset, request.target_table]):
+        raise HTTPException(
+            status_code=400,
+            detail="Missing required fields for GCS comparison"
+        )
+    
+    # Create mapping configuration
+    mapping = {
+        'mapping_id': 'single_file_comparison',
+        'source_bucket': request.gcs_bucket,
+        'source_file_path': request.gcs_file_path,
+        'source_file_format': request.file_format,
+        'target_dataset': request.target_dataset,
+        'target_table': request.target_table,
+        'enabled_test_ids': request.enabled_test_ids or list(DEFAULT_GCS_TESTS),
+        'auto_suggest': True
+    }
+    
+    result = await test_executor.process_mapping(request.project_id, mapping)
+    
+    # Calculate summary
+    summary = _summarize(result.predefined_results)
+    
+    # Prepare response data
+    response_data = {
+        'summary': summary.model_dump(mode="json"),
+        **result.model_dump(
+            mode="json",
+            include={'mapping_info', 'predefined_results', 'ai_suggestions'}
+        )
+    }
+
+    # Log execution
+    try:
+        _schedule_execution_log(
+            project_id=request.project_id,
+            execution_data={
+                "comparison_mode": "gcs_single_file",
+                "source": f"gs://{request.gcs_bucket}/{request.gcs_file_path}",
+                "target": f"{request.target_dataset}.{request.target_table}",
+                "status": "FAIL" if summary.failed > 0 or summary.errors > 0 else "PASS",
+                "total_tests": summary.total_tests,
+                "passed_tests": summary.passed,
+                "failed_tests": summary.failed,
+                "details": {
+                    'summary': response_data['summary'],
+                    **result.model_dump(
+                        include={'mapping_info', 'predefined_results', 'ai_suggestions'},
+                        **_LOG_DUMP_OPTIONS
+                    )
+                }
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to log execution: {e}")
+    
+    return ORJSONResponse(response_data)
+
+
+async def _handle_schema(request: GenerateTestsRequest) -> ORJSONResponse:
+    """Schema validation mode: validate BigQuery schemas against an ERD."""
+    try:
+        result_data = await test_executor.process_schema_validation(
+            project_id=request.project_id,
+            datasets=request.datasets or [],
+            erd_description=request.erd_description or ""
+        )
+        predefined_results = result_data['predefined_results']
+        result_data['predefined_results'] = _test_results_adapter.dump_python(
+            predefined_results, mode="json"
+        )
+        
+        # Log Schema Validation
+        try:
+            summary = result_data.get('summary', {})
+            issues = result_data.get('summary', {}).get('total_issues', 0)
+            
+            _schedule_execution_log(
+                project_id=request.project_id,
+                execution_data={
+                    "comparison_mode": "schema_validation",
+                    "source": "ERD Description",
+                    "target": ",".join(request.datasets or []),
+                    "status": "AT_RISK" if issues > 0 else "PASS",
+                    "total_tests": summary.get('total_tables', 0), # Using table count as simpler metric
+                    "passed_tests": summary.get('total_tables', 0) - (1 if issues > 0 else 0), # Simplified
+                    "failed_tests": issues,
+                    "details": {
+                        **result_data,
+                        'predefined_results': _test_results_adapter.dump_python(
+                            predefined_results, **_LOG_DUMP_OPTIONS
+                        )
+                    }
+                }
+            )
+        except Exception as log_err:
+            logger.error(f"Failed to log schema execution: {log_err}")
+
+        return ORJSONResponse(result_data)
+    except Exception as e:
+        logger.error(f"Error in schema validation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# comparison_mode -> handler
+MODE_HANDLERS: Dict[str, Callable[[GenerateTestsRequest], Awaitable[ORJSONResponse]]] = {
+    'gcs-config': _handle_gcs_config,
+    'gcs': _handle_gcs,
+    'schema': _handle_schema,
+}
 
 
 @app.post("/api/generate-tests")
@@ -69,161 +400,13 @@ async def generate_tests(request: GenerateTestsRequest):
     try:
         logger.info(f"Received test generation request: mode={request.comparison_mode}")
         
-        # Config table mode
-        if request.comparison_mode == 'gcs-config':
-            if not request.config_dataset or not request.config_table:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Missing required fields: config_dataset, config_table"
-                )
-            
-            result = await test_executor.process_config_table(
-                project_id=request.project_id,
-                config_dataset=request.config_dataset,
-                config_table=request.config_table
-            )
-            
-            try:
-                from app.services.bigquery_service import bigquery_service
-                summary_data = result['summary']
-                
-                # Convert results objects to dicts for JSON serialization
-                results_by_mapping_dicts = [r.dict() for r in result['results_by_mapping']]
-
-                await bigquery_service.log_execution(
-                    project_id=request.project_id,
-                    execution_data={
-                        "comparison_mode": "gcs_config_table",
-                        "source": f"{request.config_dataset}.{request.config_table}",
-                        "target": "Multiple Targets",
-                        "status": "AT_RISK" if summary_data['failed'] > 0 else "PASS",
-                        "total_tests": summary_data['total_tests'],
-                        "passed_tests": summary_data['passed'],
-                        "failed_tests": summary_data['failed'],
-                        "details": {
-                            "summary": summary_data,
-                            "results_by_mapping": results_by_mapping_dicts
-                        }
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Failed to log config execution: {e}")
-
-            return ConfigTableResponse(
-                summary=ConfigTableSummary(**result['summary']),
-                results_by_mapping=result['results_by_mapping']
-            )
-        
-
-        # GCS Single File
-        elif request.comparison_mode == 'gcs':
-            if not all([request.gcs_bucket, request.gcs_file_path, 
-                       request.target_dataset, request.target_table]):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Missing required fields for GCS comparison"
-                )
-            
-            # Create mapping configuration
-            mapping = {
-                'mapping_id': 'single_file_comparison',
-                'source_bucket': request.gcs_bucket,
-                'source_file_path': request.gcs_file_path,
-                'source_file_format': request.file_format,
-                'target_dataset': request.target_dataset,
-                'target_table': request.target_table,
-                'enabled_test_ids': request.enabled_test_ids or ['row_count_match', 'no_nulls_required', 'no_duplicates_pk'],
-                'auto_suggest': True
-            }
-            
-            result = await test_executor.process_mapping(request.project_id, mapping)
-            
-            # Calculate summary
-            summary = TestSummary(
-                total_tests=len(result.predefined_results),
-                passed=len([t for t in result.predefined_results if t.status == 'PASS']),
-                failed=len([t for t in result.predefined_results if t.status == 'FAIL']),
-                errors=len([t for t in result.predefined_results if t.status == 'ERROR'])
-            )
-            
-            # Prepare response data
-            response_data = {
-                'summary': summary,
-                'mapping_info': result.mapping_info,
-                'predefined_results': result.predefined_results,
-                'ai_suggestions': result.ai_suggestions
-            }
-
-            # Log execution
-            try:
-                from app.services.bigquery_service import bigquery_service
-                await bigquery_service.log_execution(
-                    project_id=request.project_id,
-                    execution_data={
-                        "comparison_mode": "gcs_single_file",
-                        "source": f"gs://{request.gcs_bucket}/{request.gcs_file_path}",
-                        "target": f"{request.target_dataset}.{request.target_table}",
-                        "status": "FAIL" if summary.failed > 0 or summary.errors > 0 else "PASS",
-                        "total_tests": summary.total_tests,
-                        "passed_tests": summary.passed,
-                        "failed_tests": summary.failed,
-                        "details": {
-                            "summary": summary.dict(),
-                            "mapping_info": result.mapping_info.dict() if result.mapping_info else None,
-                            "predefined_results": [r.dict() for r in result.predefined_results],
-                            "ai_suggestions": [s.dict() for s in result.ai_suggestions]
-                        }
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Failed to log execution: {e}")
-            
-            return response_data
-        
-        # Schema validation mode
-        elif request.comparison_mode == 'schema':
-            try:
-                result_data = await test_executor.process_schema_validation(
-                    project_id=request.project_id,
-                    datasets=request.datasets or [],
-                    erd_description=request.erd_description or ""
-                )
-                
-                # Log Schema Validation
-                try:
-                    from app.services.bigquery_service import bigquery_service
-                    summary = result_data.get('summary', {})
-                    issues = result_data.get('summary', {}).get('total_issues', 0)
-                    
-                    await bigquery_service.log_execution(
-                        project_id=request.project_id,
-                        execution_data={
-                            "comparison_mode": "schema_validation",
-                            "source": "ERD Description",
-                            "target": ",".join(request.datasets or []),
-                            "status": "AT_RISK" if issues > 0 else "PASS",
-                            "total_tests": summary.get('total_tables', 0), # Using table count as simpler metric
-                            "passed_tests": summary.get('total_tables', 0) - (1 if issues > 0 else 0), # Simplified
-                            "failed_tests": issues,
-                            "details": result_data
-                        }
-                    )
-                except Exception as log_err:
-                    logger.error(f"Failed to log schema execution: {log_err}")
-
-                return result_data
-            except Exception as e:
-                logger.error(f"Error in schema validation: {str(e)}")
-                raise HTTPException(status_code=500, detail=str(e))
-        
-        else:
+        handler = MODE_HANDLERS.get(request.comparison_mode)
+        if handler is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid comparison_mode: {request.comparison_mode}"
             )
-
-
-
+        return await handler(request)
             
     except HTTPException:
         raise
@@ -232,24 +415,67 @@ async def generate_tests(request: GenerateTestsRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/generate-tests/stream")
+async def stream_config_tests(request: GenerateTestsRequest):
+    """
+    Config table mode, streamed as NDJSON.
+    
+    Emits one {"mapping_result": ...} line per mapping as soon as it
+    finishes (in completion order), then a final {"summary": ...} line.
+    """
+    if not request.config_dataset or not request.config_table:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing required fields: config_dataset, config_table"
+        )
+    
+    mapping_results = test_executor.iter_config_table(
+        project_id=request.project_id,
+        config_dataset=request.config_dataset,
+        config_table=request.config_table
+    )
+    # Wait for the first result before answering, so a config table that
+    # can't be read still fails with an error status
+    try:
+        first_result = await anext(mapping_results)
+    except Exception as e:
+        await mapping_results.aclose()
+        logger.error(f"Error processing config table: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def ndjson_lines():
+        results = [first_result]
+        yield orjson.dumps({'mapping_result': first_result.model_dump(mode="json")}) + b"\n"
+        async with aclosing(mapping_results):
+            async for result in mapping_results:
+                results.append(result)
+                yield orjson.dumps({'mapping_result': result.model_dump(mode="json")}) + b"\n"
+        
+        summary_data = ConfigTableSummary(
+            **test_executor.summarize_mappings(results)
+        ).model_dump(mode="json")
+        yield orjson.dumps({'summary': summary_data}) + b"\n"
+        _log_config_execution(request, summary_data, results)
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 
 @app.get("/api/history")
 async def get_test_history(project_id: str = settings.google_cloud_project, limit: int = 50):
     """Get previous test runs from BigQuery."""
     try:
-        from app.services.bigquery_service import bigquery_service
-        return await bigquery_service.get_execution_history(project_id=project_id, limit=limit)
+        history = await bigquery_service.get_execution_history(project_id=project_id, limit=limit)
+        # Rows are plain values (str/int/datetime), which orjson encodes natively
+        return ORJSONResponse(history)
     except Exception as e:
         logger.error(f"Error fetching history: {e}")
         return []
 
 
-@app.get("/api/predefined-tests")
-async def list_predefined_tests():
-    """List all available predefined tests."""
-    from app.tests.predefined_tests import PREDEFINED_TESTS
-    
-    return {
+@functools.cache
+def _predefined_tests_json() -> bytes:
+    """Serialize the (static) predefined test catalogue once per process."""
+    return orjson.dumps({
         'tests': [
             {
                 'id': test.id,
@@ -261,7 +487,13 @@ async def list_predefined_tests():
             }
             for test in PREDEFINED_TESTS.values()
         ]
-    }
+    })
+
+
+@app.get("/api/predefined-tests")
+async def list_predefined_tests():
+    """List all available predefined tests."""
+    return Response(content=_predefined_tests_json(), media_type="application/json")
 
 
 
@@ -269,8 +501,7 @@ async def list_predefined_tests():
 async def save_custom_test(request: CustomTestRequest):
     """Save a custom test case."""
     try:
-        from app.services.bigquery_service import bigquery_service
-        success = await bigquery_service.save_custom_test(request.dict())
+        success = await bigquery_service.save_custom_test(request.model_dump())
         if not success:
             raise HTTPException(status_code=500, detail="Failed to save custom test")
         return {"status": "success", "message": "Custom test saved"}
@@ -279,6 +510,15 @@ async def save_custom_test(request: CustomTestRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/cache/invalidate")
+async def invalidate_metadata_cache(table_ref: str):
+    """Drop cached metadata for a `project.dataset` or `project.dataset.table`."""
+    if table_ref.count('.') not in (1, 2):
+        raise HTTPException(status_code=400, detail="table_ref must be project.dataset or project.dataset.table")
+    bigquery_service.invalidate(table_ref)
+    return {"status": "success", "message": f"Invalidated cached metadata for {table_ref}"}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -33,7 +33,7 @@ class TestResult(BaseModel):
     test_name: str
     category: Optional[str] = None
     description: str
-    status: str  # PASS, FAIL, ERROR
+    status: str  # PASS, FAIL, ERROR, SKIPPED
     severity: str  # HIGH, MEDIUM, LOW
     sql_query: str
     rows_affected: int = 0
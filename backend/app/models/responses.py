@@ -10,6 +10,7 @@ class TestSummary(BaseModel):
     passed: int = 0
     failed: int = 0
     errors: int = 0
+    skipped: int = 0
 
 
 class ConfigTableSummary(BaseModel):
@@ -19,6 +20,7 @@ class ConfigTableSummary(BaseModel):
     passed: int = 0
     failed: int = 0
     errors: int = 0
+    skipped: int = 0
     total_suggestions: int = 0
 
 
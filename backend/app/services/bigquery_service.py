@@ -1,8 +1,146 @@
 """BigQuery service for database operations."""
-from typing import List, Dict, Any
-import json
+import asyncio
+import contextlib
+import datetime
+import functools
+import logging
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
+import orjson
+from cachetools import TTLCache
 from google.cloud import bigquery
 
+from app.config import settings
+from app.services.http_client import shared_session
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched execution history page is served from memory
+HISTORY_CACHE_TTL_SECONDS = 10
+
+# Streaming inserts to the same table are coalesced for this long
+INSERT_FLUSH_SECONDS = 0.05
+# tabledata.insertAll rows per request
+MAX_ROWS_PER_INSERT = 500
+
+# Threads available for blocking BigQuery client calls. This bounds how
+# many BigQuery requests the service has in flight at once.
+MAX_CLIENT_THREADS = 16
+
+# Let orjson accept the non-str dict keys and numpy values json.dumps took
+_DETAILS_DUMP_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+# Characters allowed in a table reference embedded in SQL between backticks
+_TABLE_REF_RE = re.compile(r'^[A-Za-z0-9_\-.:]+$')
+
+# Schemas for the tables this service creates on demand
+_HISTORY_SCHEMA = [
+    bigquery.SchemaField("execution_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("timestamp", "TIMESTAMP", mode="REQUIRED"),
+    bigquery.SchemaField("project_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("comparison_mode", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("source", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("target", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("status", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("total_tests", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("passed_tests", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("failed_tests", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("details", "JSON", mode="NULLABLE"),
+]
+
+_CUSTOM_TESTS_SCHEMA = [
+    bigquery.SchemaField("test_id", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("created_at", "TIMESTAMP", mode="REQUIRED"),
+    bigquery.SchemaField("test_name", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("test_category", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("severity", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("sql_query", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("description", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("target_dataset", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("target_table", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("is_active", "BOOLEAN", mode="REQUIRED"),
+]
+
+# Marks the end of the rows iter_query's producer thread hands over
+_END_OF_ROWS = object()
+# Rows iter_query buffers ahead of its consumer; the producer thread waits
+# (and stops paging) while the buffer is full
+ITER_QUERY_BUFFER_ROWS = 1000
+
+
+def _utcnow_iso() -> str:
+    """Current time as a timezone-aware UTC ISO-8601 string."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _checked_table_ref(table_ref: str) -> str:
+    """Return table_ref if it is safe to embed in SQL, else raise ValueError."""
+    if not _TABLE_REF_RE.match(table_ref):
+        raise ValueError(f"Invalid table reference: {table_ref!r}")
+    return table_ref
+
+
+class _InsertBatcher:
+    """Coalesces single-row streaming inserts per table into one request."""
+    
+    def __init__(
+        self,
+        insert_rows: Callable[[str, List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+        flush_seconds: float = INSERT_FLUSH_SECONDS,
+        max_rows: int = MAX_ROWS_PER_INSERT
+    ):
+        self._insert_rows = insert_rows
+        self._flush_seconds = flush_seconds
+        self._max_rows = max_rows
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def enqueue(self, table: str, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Queue a row for insertion and wait for its batch to be written.
+        
+        Returns:
+            The insert errors reported for this row (empty on success)
+        """
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(table, [])
+        pending.append((row, future))
+        if len(pending) >= self._max_rows:
+            await self._flush_table(table)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+    
+    async def flush(self) -> None:
+        """Write every pending row now."""
+        for table in list(self._pending):
+            await self._flush_table(table)
+    
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._flush_seconds)
+        self._flush_task = None
+        await self.flush()
+    
+    async def _flush_table(self, table: str) -> None:
+        entries = self._pending.pop(table, [])
+        for start in range(0, len(entries), self._max_rows):
+            chunk = entries[start:start + self._max_rows]
+            try:
+                errors = await self._insert_rows(table, [row for row, _ in chunk])
+            except Exception as e:
+                for _, future in chunk:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            errors_by_index = {error['index']: [error] for error in errors or []}
+            for index, (_, future) in enumerate(chunk):
+                if not future.done():
+                    future.set_result(errors_by_index.get(index, []))
+
 
 class BigQueryService:
     """Service for BigQuery operations."""
@@ -10,14 +148,63 @@ class BigQueryService:
     def __init__(self):
         """Initialize BigQuery service."""
         self._client = None
+        # The client library is synchronous; its calls run here so they
+        # don't block the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_CLIENT_THREADS, thread_name_prefix="bigquery"
+        )
+        self._insert_batcher = _InsertBatcher(
+            lambda table, rows: self._run_blocking(self.client.insert_rows_json, table, rows)
+        )
+        # Process-local caches keyed by "project.dataset[.table]"
+        self._table_metadata_cache = TTLCache(maxsize=1024, ttl=settings.metadata_cache_ttl_seconds)
+        self._dataset_tables_cache = TTLCache(maxsize=256, ttl=settings.metadata_cache_ttl_seconds)
+        self._existing_datasets = TTLCache(maxsize=256, ttl=settings.metadata_cache_ttl_seconds)
+        self._existing_tables = TTLCache(maxsize=1024, ttl=settings.metadata_cache_ttl_seconds)
+        self._metadata_fetches: Dict[str, asyncio.Future] = {}
+        self._history_cache = TTLCache(maxsize=64, ttl=HISTORY_CACHE_TTL_SECONDS)
+        self._ensure_lock = asyncio.Lock()
 
     @property
     def client(self):
         """Lazy load BigQuery client."""
         if not self._client:
-            self._client = bigquery.Client()
+            session, project = shared_session()
+            self._client = bigquery.Client(
+                project=project,
+                credentials=session.credentials,
+                _http=session
+            )
         return self._client
     
+    async def _run_blocking(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking client call on the service's thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+    
+    async def flush_inserts(self) -> None:
+        """Write any streaming inserts still waiting to be batched."""
+        await self._insert_batcher.flush()
+    
+    def invalidate(self, table_ref: str) -> None:
+        """
+        Drop cached metadata for a table or dataset after a schema change.
+        
+        Args:
+            table_ref: "project.dataset.table" or "project.dataset"
+        """
+        self._table_metadata_cache.pop(table_ref, None)
+        self._existing_tables.pop(table_ref, None)
+        dataset_ref = table_ref if table_ref.count('.') == 1 else table_ref.rsplit('.', 1)[0]
+        self._dataset_tables_cache.pop(dataset_ref, None)
+        if table_ref == dataset_ref:
+            self._existing_datasets.pop(dataset_ref, None)
+            for cache in (self._table_metadata_cache, self._existing_tables):
+                for key in [k for k in cache if k.startswith(f"{dataset_ref}.")]:
+                    cache.pop(key, None)
+    
     async def get_table_metadata(
         self, 
         project_id: str, 
@@ -35,52 +222,148 @@ class BigQueryService:
         Returns:
             Dictionary containing table metadata
         """
+        table_ref = f"{project_id}.{dataset_id}.{table_id}"
+        cached = self._table_metadata_cache.get(table_ref)
+        if cached is not None:
+            return cached
+        
+        # Concurrent misses for the same table share one get_table call
+        fetch = self._metadata_fetches.get(table_ref)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_table_metadata(table_ref))
+            self._metadata_fetches[table_ref] = fetch
+            fetch.add_done_callback(lambda _: self._metadata_fetches.pop(table_ref, None))
+        
         try:
-            table_ref = f"{project_id}.{dataset_id}.{table_id}"
-            table = self.client.get_table(table_ref)
-            
-            return {
-                "full_table_name": table_ref,
-                "schema": {
-                    "fields": [
-                        {
-                            "name": field.name,
-                            "type": field.field_type,
-                            "mode": field.mode
-                        }
-                        for field in table.schema
-                    ]
-                },
-                "num_rows": table.num_rows,
-                "created": table.created.isoformat() if table.created else None,
-                "modified": table.modified.isoformat() if table.modified else None
-            }
+            # Shielded so one waiter being cancelled doesn't cancel the others
+            return await asyncio.shield(fetch)
             
         except Exception as e:
             raise ValueError(
                 f"Failed to get metadata for {project_id}.{dataset_id}.{table_id}: {str(e)}"
             )
     
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    async def _fetch_table_metadata(self, table_ref: str) -> Dict[str, Any]:
+        """Fetch a table's metadata from BigQuery and cache it."""
+        table = await self._run_blocking(self.client.get_table, table_ref)
+        return self._cache_table_metadata(table_ref, table)
+    
+    def _cache_table_metadata(self, table_ref: str, table: bigquery.Table) -> Dict[str, Any]:
+        """Build the metadata dict for a fetched table and cache it."""
+        metadata = {
+            "full_table_name": table_ref,
+            "schema": {
+                "fields": [
+                    {
+                        "name": field.name,
+                        "type": field.field_type,
+                        "mode": field.mode
+                    }
+                    for field in table.schema
+                ]
+            },
+            "num_rows": table.num_rows,
+            "created": table.created.isoformat() if table.created else None,
+            "modified": table.modified.isoformat() if table.modified else None
+        }
+        self._table_metadata_cache[table_ref] = metadata
+        self._existing_tables[table_ref] = True
+        return metadata
+    
+    async def execute_query(
+        self,
+        query: str,
+        params: Optional[List[bigquery.ScalarQueryParameter]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Execute a BigQuery SQL query.
         
         Args:
             query: SQL query string
+            params: Query parameters referenced as @name in the query
             
         Returns:
             List of dictionaries representing rows
         """
         try:
-            query_job = self.client.query(query)
-            results = query_job.result()
+            client = self.client
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=params or [],
+                use_query_cache=True
+            )
+            
+            def run_query() -> List[Dict[str, Any]]:
+                query_job = client.query(query, job_config=job_config)
+                results = query_job.result()
+                
+                # Convert to list of dicts
+                return [dict(row) for row in results]
             
-            # Convert to list of dicts
-            return [dict(row) for row in results]
+            return await self._run_blocking(run_query)
             
         except Exception as e:
             raise ValueError(f"Query execution failed: {str(e)}")
     
+    async def iter_query(
+        self,
+        query: str,
+        params: Optional[List[bigquery.ScalarQueryParameter]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a BigQuery SQL query and yield rows as they are fetched.
+        
+        Rows are paged in on a worker thread while the caller consumes
+        them, at most ITER_QUERY_BUFFER_ROWS ahead of it, and paging stops
+        once the caller stops iterating.
+        
+        Args:
+            query: SQL query string
+            params: Query parameters referenced as @name in the query
+            
+        Yields:
+            Dictionaries representing rows
+        """
+        loop = asyncio.get_running_loop()
+        rows: asyncio.Queue = asyncio.Queue(maxsize=ITER_QUERY_BUFFER_ROWS)
+        stop = threading.Event()
+        client = self.client
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=params or [],
+            use_query_cache=True
+        )
+        
+        def hand_over(item: Any) -> None:
+            try:
+                # Blocks this thread while the buffer is full
+                asyncio.run_coroutine_threadsafe(rows.put(item), loop).result()
+            except (RuntimeError, asyncio.CancelledError):
+                stop.set()  # Event loop is gone; nobody is listening
+        
+        def produce_rows() -> None:
+            try:
+                for row in client.query(query, job_config=job_config).result():
+                    if stop.is_set():
+                        return
+                    hand_over(dict(row))
+                hand_over(_END_OF_ROWS)
+            except Exception as e:
+                hand_over(e)
+        
+        loop.run_in_executor(self._executor, produce_rows)
+        try:
+            while True:
+                item = await rows.get()
+                if item is _END_OF_ROWS:
+                    return
+                if isinstance(item, Exception):
+                    raise ValueError(f"Query execution failed: {str(item)}")
+                yield item
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full buffer so it sees the stop
+            while not rows.empty():
+                rows.get_nowait()
+    
     async def get_row_count(self, full_table_name: str) -> int:
         """
         Get row count for a table.
@@ -91,9 +374,63 @@ class BigQueryService:
         Returns:
             Number of rows
         """
-        query = f"SELECT COUNT(*) as count FROM `{full_table_name}`"
-        results = await self.execute_query(query)
-        return int(results[0]['count'])
+        # Table metadata carries the row count unless rows are still in the
+        # streaming buffer (or it isn't a native table); fetch it fresh
+        # rather than from the cache, and refresh the cache with it.
+        try:
+            table = await self._run_blocking(self.client.get_table, full_table_name)
+            self._cache_table_metadata(full_table_name, table)
+            if (
+                table.table_type == "TABLE"
+                and table.num_rows is not None
+                and table.streaming_buffer is None
+            ):
+                return int(table.num_rows)
+        except Exception:
+            pass  # Fall back to counting with a query
+        
+        query = f"SELECT COUNT(*) as count FROM `{_checked_table_ref(full_table_name)}`"
+        async with contextlib.aclosing(self.iter_query(query)) as rows:
+            async for row in rows:
+                return int(row['count'])
+        raise ValueError(f"Row count query returned no rows for {full_table_name}")
+    
+    async def count_gcs_csv_rows(self, source_uri: str) -> int:
+        """
+        Count data rows in a CSV file on GCS by querying it as a temporary
+        external table, so BigQuery does the scan instead of this process.
+        
+        Args:
+            source_uri: gs:// URI of the CSV file
+            
+        Returns:
+            Number of rows (excluding header)
+        """
+        try:
+            client = self.client
+            # Only the row count matters: declare one column and let the
+            # rest of each record be ignored
+            external_config = bigquery.ExternalConfig("CSV")
+            external_config.source_uris = [source_uri]
+            external_config.schema = [bigquery.SchemaField("c0", "STRING")]
+            external_config.ignore_unknown_values = True
+            external_config.options.skip_leading_rows = 1
+            external_config.options.allow_jagged_rows = True
+            external_config.options.allow_quoted_newlines = True
+            job_config = bigquery.QueryJobConfig(
+                table_definitions={"csv_source": external_config}
+            )
+            
+            def run_count() -> int:
+                query_job = client.query(
+                    "SELECT COUNT(*) AS count FROM csv_source", job_config=job_config
+                )
+                return int(next(iter(query_job.result()))['count'])
+            
+            return await self._run_blocking(run_count)
+            
+        except Exception as e:
+            raise ValueError(f"Failed to count rows in {source_uri}: {str(e)}")
     
     async def get_sample_data(
         self, 
@@ -110,8 +447,10 @@ class BigQueryService:
         Returns:
             List of dictionaries representing rows
         """
-        query = f"SELECT * FROM `{full_table_name}` LIMIT {limit}"
-        return await self.execute_query(query)
+        query = f"SELECT * FROM `{_checked_table_ref(full_table_name)}` LIMIT @lim"
+        return await self.execute_query(
+            query, [bigquery.ScalarQueryParameter('lim', 'INT64', limit)]
+        )
     
     async def get_tables_in_dataset(
         self, 
@@ -128,18 +467,60 @@ class BigQueryService:
         Returns:
             List of table IDs
         """
+        dataset_ref = f"{project_id}.{dataset_id}"
+        cached = self._dataset_tables_cache.get(dataset_ref)
+        if cached is not None:
+            return list(cached)
+        
         try:
-            dataset_ref = f"{project_id}.{dataset_id}"
-            dataset = self.client.get_dataset(dataset_ref)
-            tables = self.client.list_tables(dataset)
+            client = self.client
             
-            return [table.table_id for table in tables]
+            def list_table_ids() -> List[str]:
+                dataset = client.get_dataset(dataset_ref)
+                tables = client.list_tables(dataset)
+                return [table.table_id for table in tables]
+            
+            table_ids = await self._run_blocking(list_table_ids)
+            self._dataset_tables_cache[dataset_ref] = table_ids
+            self._existing_datasets[dataset_ref] = True
+            return list(table_ids)
             
         except Exception as e:
             raise ValueError(
                 f"Failed to list tables in {project_id}.{dataset_id}: {str(e)}"
             )
     
+    async def get_tables_with_metadata(
+        self, 
+        project_id: str, 
+        dataset_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Get metadata for every table in a dataset, fetched concurrently.
+        
+        Args:
+            project_id: Google Cloud project ID
+            dataset_id: BigQuery dataset ID
+            
+        Returns:
+            List of table metadata dictionaries; tables whose metadata
+            could not be fetched are skipped
+        """
+        table_ids = await self.get_tables_in_dataset(project_id, dataset_id)
+        # No point queueing more lookups than there are threads to run them
+        semaphore = asyncio.Semaphore(MAX_CLIENT_THREADS)
+        
+        async def fetch(table_id: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await self.get_table_metadata(project_id, dataset_id, table_id)
+                except Exception as e:
+                    logger.warning("Skipping table %s: %s", table_id, e)
+                    return None
+        
+        results = await asyncio.gather(*(fetch(table_id) for table_id in table_ids))
+        return [metadata for metadata in results if metadata is not None]
+    
     async def read_config_table(
         self, 
         project_id: str, 
@@ -159,7 +540,7 @@ class BigQueryService:
         """
         query = f"""
             SELECT *
-            FROM `{project_id}.{config_dataset}.{config_table}`
+            FROM `{_checked_table_ref(f"{project_id}.{config_dataset}.{config_table}")}`
             WHERE is_active = true
         """
         return await self.execute_query(query)
@@ -180,47 +561,49 @@ class BigQueryService:
         """
         try:
             full_table_name = f"{project_id}.{dataset_id}.{table_id}"
+            if full_table_name in self._existing_tables:
+                return full_table_name
             
-            # 1. Ensure dataset exists
-            try:
-                self.client.get_dataset(f"{project_id}.{dataset_id}")
-            except Exception: # NotFound
-                print(f"Dataset {dataset_id} not found, creating...")
+            # Serialize the slow path so concurrent first calls don't race to create
+            async with self._ensure_lock:
+                if full_table_name in self._existing_tables:
+                    return full_table_name
+
+                # 1. Ensure dataset exists
+                dataset_ref = f"{project_id}.{dataset_id}"
+                if dataset_ref not in self._existing_datasets:
+                    try:
+                        await self._run_blocking(self.client.get_dataset, dataset_ref)
+                        self._existing_datasets[dataset_ref] = True
+                    except Exception: # NotFound
+                        print(f"Dataset {dataset_id} not found, creating...")
+                        try:
+                            dataset = bigquery.Dataset(dataset_ref)
+                            dataset.location = "US" # Default to US or make configurable
+                            await self._run_blocking(self.client.create_dataset, dataset)
+                            self.invalidate(dataset_ref)
+                            self._existing_datasets[dataset_ref] = True
+                            print(f"Created dataset: {dataset_id}")
+                        except Exception as e:
+                            print(f"Failed to create dataset {dataset_id}: {e}")
+                            # Allow to proceed, maybe it exists but permission issue
+
+                # 2. Check if table exists
                 try:
-                    dataset = bigquery.Dataset(f"{project_id}.{dataset_id}")
-                    dataset.location = "US" # Default to US or make configurable
-                    self.client.create_dataset(dataset)
-                    print(f"Created dataset: {dataset_id}")
-                except Exception as e:
-                    print(f"Failed to create dataset {dataset_id}: {e}")
-                    # Allow to proceed, maybe it exists but permission issue
+                    await self._run_blocking(self.client.get_table, full_table_name)
+                    self._existing_tables[full_table_name] = True
+                    return full_table_name
+                except Exception:
+                    # Table doesn't exist, create it
+                    pass
 
-            # 2. Check if table exists
-            try:
-                self.client.get_table(full_table_name)
+                table = bigquery.Table(full_table_name, schema=_HISTORY_SCHEMA)
+                await self._run_blocking(self.client.create_table, table)
+                # The dataset's cached table listing no longer includes every table
+                self.invalidate(full_table_name)
+                self._existing_tables[full_table_name] = True
+                print(f"Created history table: {full_table_name}")
                 return full_table_name
-            except Exception:
-                # Table doesn't exist, create it
-                pass
-            
-            schema = [
-                bigquery.SchemaField("execution_id", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("timestamp", "TIMESTAMP", mode="REQUIRED"),
-                bigquery.SchemaField("project_id", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("comparison_mode", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("source", "STRING", mode="NULLABLE"),
-                bigquery.SchemaField("target", "STRING", mode="NULLABLE"),
-                bigquery.SchemaField("status", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("total_tests", "INTEGER", mode="REQUIRED"),
-                bigquery.SchemaField("passed_tests", "INTEGER", mode="REQUIRED"),
-                bigquery.SchemaField("failed_tests", "INTEGER", mode="REQUIRED"),
-                bigquery.SchemaField("details", "JSON", mode="NULLABLE"),
-            ]
-            
-            table = bigquery.Table(full_table_name, schema=schema)
-            self.client.create_table(table)
-            print(f"Created history table: {full_table_name}")
-            return full_table_name
             
         except Exception as e:
             print(f"Warning: Failed to ensure history table: {str(e)}")
@@ -236,23 +619,27 @@ class BigQueryService:
         """
         Log execution result to history table.
         """
-        try:
-            full_table_name = await self.ensure_history_table(project_id, dataset_id, table_id)
-            
-            # Prepare row
-            row = {
-                "execution_id": execution_data.get("execution_id"),
-                "timestamp": "Generic::current_timestamp", # BQ handles this if we use SQL, but for insert_rows we need value. 
-                # Better to use INSERT statement or current_timestamp() in SQL
-            }
-            # Actually, let's use insert_rows_json
-            
-            import datetime
-            import uuid
-            
-            row = {
+        await self.log_executions_bulk([(project_id, execution_data)], dataset_id, table_id)
+
+    async def log_executions_bulk(
+        self,
+        records: List[Tuple[str, Dict[str, Any]]],
+        dataset_id: str = "config",
+        table_id: str = "execution_history"
+    ) -> None:
+        """
+        Log several execution results with one insert per project.
+        
+        Args:
+            records: (project_id, execution_data) pairs
+            dataset_id: History table dataset
+            table_id: History table name
+        """
+        rows_by_project: Dict[str, List[Dict[str, Any]]] = {}
+        for project_id, execution_data in records:
+            rows_by_project.setdefault(project_id, []).append({
                 "execution_id": execution_data.get("execution_id") or str(uuid.uuid4()),
-                "timestamp": datetime.datetime.now().isoformat(),
+                "timestamp": execution_data.get("timestamp") or _utcnow_iso(),
                 "project_id": project_id,
                 "comparison_mode": execution_data.get("comparison_mode", "unknown"),
                 "source": execution_data.get("source", ""),
@@ -261,15 +648,26 @@ class BigQueryService:
                 "total_tests": execution_data.get("total_tests", 0),
                 "passed_tests": execution_data.get("passed_tests", 0),
                 "failed_tests": execution_data.get("failed_tests", 0),
-                "details": json.dumps(execution_data.get("details", {}), default=str)
-            }
-            
-            errors = self.client.insert_rows_json(full_table_name, [row])
-            if errors:
-                print(f"Failed to insert history row: {errors}")
+                "details": orjson.dumps(
+                    execution_data.get("details", {}), default=str, option=_DETAILS_DUMP_OPTIONS
+                ).decode()
+            })
+        
+        for project_id, rows in rows_by_project.items():
+            try:
+                full_table_name = await self.ensure_history_table(project_id, dataset_id, table_id)
                 
-        except Exception as e:
-            print(f"Failed to log execution: {str(e)}")
+                row_errors = await asyncio.gather(*(
+                    self._insert_batcher.enqueue(full_table_name, row) for row in rows
+                ))
+                errors = [error for errors in row_errors for error in errors]
+                # New runs should show up on the next history fetch
+                self._history_cache.clear()
+                if errors:
+                    print(f"Failed to insert history rows: {errors}")
+                    
+            except Exception as e:
+                print(f"Failed to log executions for {project_id}: {str(e)}")
 
     async def get_execution_history(
         self,
@@ -279,16 +677,26 @@ class BigQueryService:
         limit: int = 50
     ) -> List[Dict[str, Any]]:
         """Get recent execution history."""
+        cache_key = (project_id, dataset_id, table_id, limit)
+        cached = self._history_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
             # Ensure table exists before querying to avoid NotFound errors
-            await self.ensure_history_table(project_id, dataset_id, table_id)
+            full_table_name = await self.ensure_history_table(project_id, dataset_id, table_id)
             
             query = f"""
                 SELECT *
-                FROM `{project_id}.{dataset_id}.{table_id}`
+                FROM `{_checked_table_ref(full_table_name)}`
                 ORDER BY timestamp DESC
-                LIMIT {limit}
+                LIMIT @lim
             """
+            rows = await self.execute_query(
+                query, [bigquery.ScalarQueryParameter('lim', 'INT64', limit)]
+            )
+            self._history_cache[cache_key] = rows
+            return list(rows)
         except Exception as e:
             print(f"Failed to fetch history: {str(e)}")
             return []
@@ -307,42 +715,45 @@ class BigQueryService:
         """
         try:
             full_table_name = f"{project_id}.{dataset_id}.{table_id}"
+            if full_table_name in self._existing_tables:
+                return full_table_name
             
-            # 1. Ensure dataset exists (reuse logic or rely on history table check having done it, but safer to check)
-            try:
-                self.client.get_dataset(f"{project_id}.{dataset_id}")
-            except Exception: # NotFound
+            # Serialize the slow path so concurrent first calls don't race to create
+            async with self._ensure_lock:
+                if full_table_name in self._existing_tables:
+                    return full_table_name
+
+                # 1. Ensure dataset exists (reuse logic or rely on history table check having done it, but safer to check)
+                dataset_ref = f"{project_id}.{dataset_id}"
+                if dataset_ref not in self._existing_datasets:
+                    try:
+                        await self._run_blocking(self.client.get_dataset, dataset_ref)
+                        self._existing_datasets[dataset_ref] = True
+                    except Exception: # NotFound
+                        try:
+                            dataset = bigquery.Dataset(dataset_ref)
+                            dataset.location = "US"
+                            await self._run_blocking(self.client.create_dataset, dataset)
+                            self.invalidate(dataset_ref)
+                            self._existing_datasets[dataset_ref] = True
+                        except Exception as e:
+                            print(f"Failed to create dataset {dataset_id}: {e}")
+
+                # 2. Check if table exists
                 try:
-                    dataset = bigquery.Dataset(f"{project_id}.{dataset_id}")
-                    dataset.location = "US"
-                    self.client.create_dataset(dataset)
-                except Exception as e:
-                    print(f"Failed to create dataset {dataset_id}: {e}")
+                    await self._run_blocking(self.client.get_table, full_table_name)
+                    self._existing_tables[full_table_name] = True
+                    return full_table_name
+                except Exception:
+                    pass
 
-            # 2. Check if table exists
-            try:
-                self.client.get_table(full_table_name)
+                table = bigquery.Table(full_table_name, schema=_CUSTOM_TESTS_SCHEMA)
+                await self._run_blocking(self.client.create_table, table)
+                # The dataset's cached table listing no longer includes every table
+                self.invalidate(full_table_name)
+                self._existing_tables[full_table_name] = True
+                print(f"Created custom tests table: {full_table_name}")
                 return full_table_name
-            except Exception:
-                pass
-            
-            schema = [
-                bigquery.SchemaField("test_id", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("created_at", "TIMESTAMP", mode="REQUIRED"),
-                bigquery.SchemaField("test_name", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("test_category", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("severity", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("sql_query", "STRING", mode="REQUIRED"),
-                bigquery.SchemaField("description", "STRING", mode="NULLABLE"),
-                bigquery.SchemaField("target_dataset", "STRING", mode="NULLABLE"),
-                bigquery.SchemaField("target_table", "STRING", mode="NULLABLE"),
-                bigquery.SchemaField("is_active", "BOOLEAN", mode="REQUIRED"),
-            ]
-            
-            table = bigquery.Table(full_table_name, schema=schema)
-            self.client.create_table(table)
-            print(f"Created custom tests table: {full_table_name}")
-            return full_table_name
             
         except Exception as e:
             print(f"Warning: Failed to ensure custom tests table: {str(e)}")
@@ -360,12 +771,9 @@ class BigQueryService:
             dataset_id = test_data.get('dataset_id', 'config')
             full_table_name = await self.ensure_custom_tests_table(project_id, dataset_id)
             
-            import datetime
-            import uuid
-            
             row = {
                 "test_id": str(uuid.uuid4()),
-                "created_at": datetime.datetime.now().isoformat(),
+                "created_at": _utcnow_iso(),
                 "test_name": test_data.get('test_name'),
                 "test_category": test_data.get('test_category'),
                 "severity": test_data.get('severity'),
@@ -376,7 +784,9 @@ class BigQueryService:
                 "is_active": True
             }
             
-            errors = self.client.insert_rows_json(full_table_name, [row])
+            errors = await self._insert_batcher.enqueue(full_table_name, row)
+            # The custom tests table's cached row count/modified time is now stale
+            self._table_metadata_cache.pop(full_table_name, None)
             if errors:
                 print(f"Failed to insert custom test: {errors}")
                 return False
@@ -1,9 +1,58 @@
 """GCS (Google Cloud Storage) service for file operations."""
+import asyncio
+import csv
+import functools
+import io
 import re
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, BinaryIO, Callable, List, Dict, Tuple
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 import pandas as pd
-import io
+
+from app.services.http_client import shared_session
+
+# Range size used when streaming the start of a CSV instead of
+# downloading the whole object
+CSV_STREAM_CHUNK_SIZE = 256 * 1024
+# Range size used when streaming a whole CSV to count its rows
+CSV_COUNT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Threads available for blocking storage client calls (downloads, listings
+# and CSV parsing), so they run off the event loop
+MAX_CLIENT_THREADS = 16
+
+
+@functools.lru_cache(maxsize=256)
+def _glob_to_regex(pattern: str) -> re.Pattern:
+    """Compile a * wildcard pattern to an anchored regex, keeping literal segments literal."""
+    return re.compile('^' + '.*'.join(map(re.escape, pattern.split('*'))) + '$')
+
+
+def _count_csv_records(stream: BinaryIO) -> int:
+    """
+    Count the data records in a CSV byte stream the way pandas reads it.
+    
+    Quoted fields may span lines, any line ending is accepted and blank
+    (or whitespace-only) lines are skipped. The header is not counted.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+    records = sum(
+        1 for row in csv.reader(text)
+        if len(row) > 1 or (row and row[0].strip())
+    )
+    return max(records - 1, 0)
+
+
+def _blocking(method: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """Turn a blocking GCSService method into a coroutine run on its thread pool."""
+    @functools.wraps(method)
+    async def run(self: "GCSService", *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, self, *args, **kwargs)
+        )
+    return run
 
 
 class GCSService:
@@ -12,15 +61,32 @@ class GCSService:
     def __init__(self):
         """Initialize GCS service."""
         self._client = None
+        self._buckets: Dict[str, storage.Bucket] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_CLIENT_THREADS, thread_name_prefix="gcs"
+        )
 
     @property
     def client(self):
         """Lazy load GCS client."""
         if not self._client:
-            self._client = storage.Client()
+            session, project = shared_session()
+            self._client = storage.Client(
+                project=project,
+                credentials=session.credentials,
+                _http=session
+            )
         return self._client
     
-    async def resolve_pattern(self, bucket_name: str, pattern: str) -> List[str]:
+    def _bucket(self, bucket_name: str) -> storage.Bucket:
+        """Return a reusable handle for a bucket (no RPC is made)."""
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            bucket = self._buckets.setdefault(bucket_name, self.client.bucket(bucket_name))
+        return bucket
+    
+    @_blocking
+    def resolve_pattern(self, bucket_name: str, pattern: str) -> List[str]:
         """
         Resolve wildcard patterns in GCS file paths.
         
@@ -39,23 +105,26 @@ class GCSService:
             return [pattern]
         
         try:
-            bucket = self.client.bucket(bucket_name)
+            bucket = self._bucket(bucket_name)
             
             # Get prefix before wildcard
-            prefix = pattern.split('*')[0]
-            
-            # List files with prefix
-            blobs = bucket.list_blobs(prefix=prefix)
+            parts = pattern.split('*')
+            prefix = parts[0]
             
-            # Convert pattern to regex
-            regex_pattern = pattern.replace('*', '.*')
-            regex = re.compile(f'^{regex_pattern}$')
+            # List files with prefix, fetching only their names
+            blobs = bucket.list_blobs(prefix=prefix, fields='items(name),nextPageToken')
             
-            # Filter matching files
-            matching_files = [
-                blob.name for blob in blobs
-                if regex.match(blob.name)
-            ]
+            if len(parts) == 2 and not parts[1]:
+                # A single trailing wildcard: the prefix listing is the match
+                matching_files = [blob.name for blob in blobs]
+            else:
+                regex = _glob_to_regex(pattern)
+                
+                # Filter matching files
+                matching_files = [
+                    blob.name for blob in blobs
+                    if regex.match(blob.name)
+                ]
             
             if not matching_files:
                 raise ValueError(
@@ -69,7 +138,8 @@ class GCSService:
                 f"Failed to resolve pattern gs://{bucket_name}/{pattern}: {str(e)}"
             )
     
-    async def count_csv_rows(self, bucket_name: str, file_path: str) -> int:
+    @_blocking
+    def count_csv_rows(self, bucket_name: str, file_path: str) -> int:
         """
         Count rows in a CSV file.
         
@@ -81,26 +151,69 @@ class GCSService:
             Number of rows (excluding header)
         """
         try:
-            bucket = self.client.bucket(bucket_name)
+            bucket = self._bucket(bucket_name)
             blob = bucket.blob(file_path)
             
-            if not blob.exists():
+            # Stream the object through the C csv parser; nothing is held
+            # beyond one chunk and the current record
+            try:
+                with blob.open('rb', chunk_size=CSV_COUNT_CHUNK_SIZE) as f:
+                    return _count_csv_records(f)
+            except NotFound:
+                raise FileNotFoundError(
+                    f"File not found: gs://{bucket_name}/{file_path}"
+                ) from None
+        except Exception as e:
+            raise ValueError(
+                f"Failed to count rows in gs://{bucket_name}/{file_path}: {str(e)}"
+            )
+    
+    @_blocking
+    def estimate_csv_rows(self, bucket_name: str, file_path: str) -> Tuple[int, bool]:
+        """
+        Estimate rows in a CSV file from its size and the first range of rows.
+        
+        Files that fit in the first range are counted exactly.
+        
+        Args:
+            bucket_name: GCS bucket name
+            file_path: Path to CSV file
+            
+        Returns:
+            (number of rows excluding header, whether the count is exact)
+        """
+        try:
+            bucket = self._bucket(bucket_name)
+            blob = bucket.get_blob(file_path)
+            
+            if blob is None:
                 raise FileNotFoundError(
                     f"File not found: gs://{bucket_name}/{file_path}"
                 )
             
-            # Download and count rows using pandas
-            content = blob.download_as_bytes()
-            df = pd.read_csv(io.BytesIO(content))
+            with blob.open('rb', chunk_size=CSV_STREAM_CHUNK_SIZE) as f:
+                head = f.read(CSV_STREAM_CHUNK_SIZE)
             
-            return len(df)
+            if len(head) >= blob.size:
+                # Whole file read: count it the same way count_csv_rows does
+                return _count_csv_records(io.BytesIO(head)), True
+            
+            # Average the complete data rows in the range and extrapolate
+            header_end = head.find(b'\n') + 1
+            last_end = head.rfind(b'\n') + 1
+            sampled_rows = head.count(b'\n', header_end)
+            if not header_end or not sampled_rows:
+                raise ValueError("Not enough complete rows to estimate from")
+            avg_row_bytes = (last_end - header_end) / sampled_rows
+            return round((blob.size - header_end) / avg_row_bytes), False
             
         except Exception as e:
             raise ValueError(
-                f"Failed to count rows in gs://{bucket_name}/{file_path}: {str(e)}"
+                f"Failed to estimate rows in gs://{bucket_name}/{file_path}: {str(e)}"
             )
     
-    async def sample_csv_data(
+    @_blocking
+    def sample_csv_data(
         self, 
         bucket_name: str, 
         file_path: str, 
@@ -118,17 +231,17 @@ class GCSService:
             List of dictionaries representing rows
         """
         try:
-            bucket = self.client.bucket(bucket_name)
+            bucket = self._bucket(bucket_name)
             blob = bucket.blob(file_path)
             
-            if not blob.exists():
+            # Stream only as much of the file as pandas needs for `limit` rows
+            try:
+                with blob.open('rb', chunk_size=CSV_STREAM_CHUNK_SIZE) as f:
+                    df = pd.read_csv(f, nrows=limit)
+            except NotFound:
                 raise FileNotFoundError(
                     f"File not found: gs://{bucket_name}/{file_path}"
-                )
-            
-            # Download and sample using pandas
-            content = blob.download_as_bytes()
-            df = pd.read_csv(io.BytesIO(content), nrows=limit)
+                ) from None
             
             # Convert to list of dicts
             return df.to_dict('records')
@@ -138,7 +251,8 @@ class GCSService:
                 f"Failed to sample data from gs://{bucket_name}/{file_path}: {str(e)}"
             )
     
-    async def get_csv_headers(self, bucket_name: str, file_path: str) -> List[str]:
+    @_blocking
+    def get_csv_headers(self, bucket_name: str, file_path: str) -> List[str]:
         """
         Get column headers from a CSV file.
         
@@ -150,17 +264,17 @@ class GCSService:
             List of column names
         """
         try:
-            bucket = self.client.bucket(bucket_name)
+            bucket = self._bucket(bucket_name)
             blob = bucket.blob(file_path)
             
-            if not blob.exists():
+            # Stream only the first range; the header is all that's parsed
+            try:
+                with blob.open('rb', chunk_size=CSV_STREAM_CHUNK_SIZE) as f:
+                    df = pd.read_csv(f, nrows=0)
+            except NotFound:
                 raise FileNotFoundError(
                     f"File not found: gs://{bucket_name}/{file_path}"
-                )
-            
-            # Download and get headers using pandas
-            content = blob.download_as_bytes()
-            df = pd.read_csv(io.BytesIO(content), nrows=0)
+                ) from None
             
             return df.columns.tolist()
             
@@ -0,0 +1,52 @@
+"""Shared pooled HTTP transport for the Google Cloud clients."""
+import threading
+from typing import Optional, Tuple
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Pooled HTTPS connections per Google API host; kept well above the number
+# of concurrent calls so none waits for (or discards) a connection.
+HTTP_POOL_SIZE = 100
+
+# Covers both BigQuery and Cloud Storage
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+_lock = threading.Lock()
+_session: Optional[AuthorizedSession] = None
+_project: Optional[str] = None
+
+
+def shared_session() -> Tuple[AuthorizedSession, Optional[str]]:
+    """
+    Return the process-wide authorized session and default project.
+
+    The BigQuery and GCS clients share this session, so keep-alive
+    connections and TLS sessions are reused across every call they make.
+
+    Returns:
+        (session, project) from application default credentials
+    """
+    global _session, _project
+    with _lock:
+        if _session is None:
+            credentials, _project = google.auth.default(scopes=(CLOUD_PLATFORM_SCOPE,))
+            session = AuthorizedSession(credentials)
+            session.mount("https://", HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                pool_block=False,
+                max_retries=Retry(total=3, backoff_factor=0.2)
+            ))
+            _session = session
+        return _session, _project
+
+
+def close_shared_session() -> None:
+    """Close the shared session's pooled connections, if it was created."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -1,20 +1,79 @@
 """Test executor service for orchestrating test execution."""
+import asyncio
+import functools
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional
-import json
+from collections import Counter
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Tuple
+import orjson
+from cachetools import LRUCache
+from pydantic import TypeAdapter
 
+from app.config import settings
 from app.services.gcs_service import gcs_service
 from app.services.bigquery_service import bigquery_service
-from app.services.vertex_ai_service import vertex_ai_service
-from app.tests.predefined_tests import get_enabled_tests
+from app.services.vertex_ai_service import PROMPT_SAMPLE_ROWS, vertex_ai_service
+from app.tests.predefined_tests import (
+    check_test_config,
+    get_enabled_tests,
+    partition_start_literal,
+    table_source
+)
 from app.models import TestResult, MappingInfo, AISuggestion, MappingResult
 
 logger = logging.getLogger(__name__)
 
+# Number of test query row counts kept when the result cache is enabled
+QUERY_RESULT_CACHE_SIZE = 2048
+
+# Relative difference within which a size-based CSV row estimate is taken
+# as matching the table's row count
+ROW_ESTIMATE_TOLERANCE = 0.01
+
+# BigQuery column types checked for outliers when none are configured
+_NUMERIC_TYPES = frozenset({'INTEGER', 'FLOAT', 'NUMERIC', 'BIGNUMERIC'})
+
+_ai_suggestions_adapter = TypeAdapter(List[AISuggestion])
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_json(value: str) -> Dict[str, Any]:
+    """Parse a JSON check column; templated configs repeat the same blobs."""
+    return orjson.loads(value) if value else {}
+
+
+def _as_dict(value: Any) -> Dict[str, Any]:
+    """Return a config table check column as a dict, parsing JSON strings."""
+    return _parse_json(value) if isinstance(value, str) else (value or {})
+
+
+# Types of the pseudo-columns of ingestion-time partitioned tables, which
+# aren't listed in the table schema
+_PSEUDO_COLUMN_TYPES = {'_PARTITIONTIME': 'TIMESTAMP', '_PARTITIONDATE': 'DATE'}
+
+
+def _column_type(table_metadata: Dict[str, Any], column: Optional[str]) -> Optional[str]:
+    """Return a top-level column's BigQuery type, or None if it isn't known."""
+    if not column:
+        return None
+    if column.upper() in _PSEUDO_COLUMN_TYPES:
+        return _PSEUDO_COLUMN_TYPES[column.upper()]
+    for field in table_metadata['schema']['fields']:
+        if field['name'].lower() == column.lower():
+            return field['type']
+    return None
+
 
 class TestExecutor:
     """Service for executing tests on data mappings."""
     
+    def __init__(self):
+        """Initialize test executor."""
+        # (sql digest, target table modified time) -> failing row count
+        self._query_cache = LRUCache(maxsize=QUERY_RESULT_CACHE_SIZE)
+        # sql digest -> task running it, for callers issuing the same SQL
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
     async def process_mapping(
         self,
         project_id: str,
@@ -44,105 +103,156 @@ class TestExecutor:
             # Resolve wildcard pattern if present
             matching_files = await gcs_service.resolve_pattern(source_bucket, source_file_path)
             actual_file_path = matching_files[0]
-            logger.info(f"Resolved {source_file_path} to {actual_file_path}. Found {len(matching_files)} matching files.")
-            
-            # Get GCS file info
-            file_row_count = await gcs_service.count_csv_rows(source_bucket, actual_file_path)
-            
-            # Get BigQuery table info
-            bq_row_count = await bigquery_service.get_row_count(full_table_name)
-            table_metadata = await bigquery_service.get_table_metadata(project_id, target_dataset, target_table)
-            
-            # Prepare test configuration
-            test_config = {
-                'full_table_name': full_table_name,
-                'primary_key_columns': mapping.get('primary_key_columns', []) or [
-                    col['name'] for col in table_metadata['schema']['fields'] 
-                    if col['name'].lower() in ['id', 'key', 'uuid', 'guid', f"{target_table}_id"]
-                ],
-                'required_columns': mapping.get('required_columns', []) or [
-                    col['name'] for col in table_metadata['schema']['fields']
-                    if col['mode'] == 'REQUIRED'
-                ],
-                'date_columns': mapping.get('date_columns', []),
-                'numeric_range_checks': json.loads(mapping.get('numeric_range_checks', '{}')) if isinstance(mapping.get('numeric_range_checks'), str) else mapping.get('numeric_range_checks', {}),
-                'date_range_checks': json.loads(mapping.get('date_range_checks', '{}')) if isinstance(mapping.get('date_range_checks'), str) else mapping.get('date_range_checks', {}),
-                'foreign_key_checks': json.loads(mapping.get('foreign_key_checks', '{}')) if isinstance(mapping.get('foreign_key_checks'), str) else mapping.get('foreign_key_checks', {}),
-                'pattern_checks': json.loads(mapping.get('pattern_checks', '{}')) if isinstance(mapping.get('pattern_checks'), str) else mapping.get('pattern_checks', {}),
-                'outlier_columns': mapping.get('outlier_columns', []) or [
-                    col['name'] for col in table_metadata['schema']['fields']
-                    if col['type'] in ['INTEGER', 'FLOAT', 'NUMERIC', 'BIGNUMERIC']
-                ]
-            }
+            logger.info(
+                "Resolved %s to %s. Found %d matching files.",
+                source_file_path, actual_file_path, len(matching_files)
+            )
             
-            # Get enabled tests
-            enabled_test_ids = mapping.get('enabled_test_ids', [])
-            if not enabled_test_ids and not mapping.get('enabled_test_ids'):
-                 # If explicit list is empty/None, default to these for Single File mode inference
-                 # However, get_enabled_tests(None) returns Globals.
-                 # uniqueness check is Global.
-                 pass
-            enabled_tests = get_enabled_tests(enabled_test_ids)
+            # Get GCS file info and BigQuery table info; the lookups are independent.
+            # Unless exact counts are required, try a cheap size-based estimate
+            # first and only scan the whole file when it disagrees.
+            row_count_estimated = False
+            if settings.exact_row_count_always:
+                file_row_count, (bq_row_count, table_metadata) = await asyncio.gather(
+                    self._count_file_rows(source_bucket, actual_file_path),
+                    self._lookup_table(project_id, target_dataset, target_table)
+                )
+            else:
+                estimate, table_info = await asyncio.gather(
+                    gcs_service.estimate_csv_rows(source_bucket, actual_file_path),
+                    self._lookup_table(project_id, target_dataset, target_table),
+                    return_exceptions=True
+                )
+                if isinstance(table_info, Exception):
+                    raise table_info
+                bq_row_count, table_metadata = table_info
+                estimated_rows, estimate_exact = (None, False) if isinstance(estimate, Exception) else estimate
+                if estimate_exact:
+                    # Small files are read whole, so the count must match exactly
+                    file_row_count = estimated_rows
+                elif (
+                    estimated_rows is not None
+                    and abs(estimated_rows - bq_row_count) <= ROW_ESTIMATE_TOLERANCE * max(bq_row_count, 1)
+                ):
+                    file_row_count = estimated_rows
+                    row_count_estimated = True
+                else:
+                    file_row_count = await self._count_file_rows(source_bucket, actual_file_path)
+            table_version = table_metadata.get('modified') if settings.enable_result_cache else None
+            
+            # Get enabled tests (an empty/missing list means all global tests);
+            # the test configuration is only needed by tests that run SQL
+            enabled_tests = get_enabled_tests(mapping.get('enabled_test_ids'))
+            query_tests = [test for test in enabled_tests if test.id != 'row_count_match']
+            # A load that failed outright would fail every other test too
+            skip_query_tests = bool(query_tests) and self._load_failed(file_row_count, bq_row_count)
+            test_config = self._build_test_config(
+                mapping, full_table_name, target_table, table_metadata
+            ) if query_tests and not skip_query_tests else {}
             
             # Execute predefined tests
             predefined_results = []
             
             # Row count test (always run first)
-            predefined_results.append(TestResult(
-                test_id='row_count_match',
-                test_name='Row Count Match',
-                category='completeness',
-                description=f"GCS file: {file_row_count} rows, BigQuery: {bq_row_count} rows",
-                status='PASS' if file_row_count == bq_row_count else 'FAIL',
-                severity='HIGH',
-                sql_query='',
-                rows_affected=abs(file_row_count - bq_row_count),
-                error_message=f"Row count mismatch: {abs(file_row_count - bq_row_count)} rows difference" if file_row_count != bq_row_count else None
-            ))
+            if row_count_estimated:
+                predefined_results.append(TestResult.model_construct(
+                    test_id='row_count_match',
+                    test_name='Row Count Match',
+                    category='completeness',
+                    description=f"GCS file: ~{file_row_count} rows (verified by size estimate), BigQuery: {bq_row_count} rows",
+                    status='PASS',
+                    severity='HIGH',
+                    sql_query='',
+                    rows_affected=abs(file_row_count - bq_row_count),
+                    error_message=None
+                ))
+            else:
+                predefined_results.append(TestResult.model_construct(
+                    test_id='row_count_match',
+                    test_name='Row Count Match',
+                    category='completeness',
+                    description=f"GCS file: {file_row_count} rows, BigQuery: {bq_row_count} rows",
+                    status='PASS' if file_row_count == bq_row_count else 'FAIL',
+                    severity='HIGH',
+                    sql_query='',
+                    rows_affected=abs(file_row_count - bq_row_count),
+                    error_message=f"Row count mismatch: {abs(file_row_count - bq_row_count)} rows difference" if file_row_count != bq_row_count else None
+                ))
             
-            # Run other enabled tests
-            for test in enabled_tests:
-                if test.id == 'row_count_match':
-                    continue  # Already done
-                
-                sql = test.generate_sql(test_config)
-                if not sql:
-                    continue  # Skip if no SQL (test not applicable)
-                
-                try:
-                    rows = await bigquery_service.execute_query(sql)
-                    row_count = len(rows)
-                    
-                    predefined_results.append(TestResult(
+            if skip_query_tests:
+                reason = f"Skipped: row counts indicate a failed load (GCS file: {file_row_count}, BigQuery: {bq_row_count})"
+                predefined_results.extend(
+                    TestResult.model_construct(
                         test_id=test.id,
                         test_name=test.name,
                         category=test.category,
                         description=test.description,
-                        status='PASS' if row_count == 0 else 'FAIL',
+                        status='SKIPPED',
                         severity=test.severity,
-                        sql_query=sql,
-                        rows_affected=row_count,
-                        error_message=None
-                    ))
-                except Exception as e:
-                    predefined_results.append(TestResult(
-                        test_id=test.id,
-                        test_name=test.name,
-                        category=test.category,
-                        description=test.description,
-                        status='ERROR',
-                        severity=test.severity,
-                        sql_query=sql,
+                        sql_query='',
                         rows_affected=0,
-                        error_message=str(e)
-                    ))
+                        error_message=reason
+                    )
+                    for test in query_tests
+                )
+                query_tests = []
+            
+            # Run other enabled tests. Row-level tests are counted together in
+            # one scan and the rest in one batched job, the two running
+            # concurrently; should a combined query fail, its tests run on
+            # their own (bounded to cap in-flight BigQuery jobs).
+            jobs = []
+            row_tests = []
+            for test in query_tests:
+                sql = test.generate_sql(test_config)
+                if not sql:
+                    continue  # Skip if no SQL (test not applicable)
+                
+                predicate = test.generate_predicate(test_config) if test.generate_predicate else None
+                if predicate:
+                    row_tests.append((test, sql, predicate))
+                else:
+                    jobs.append((test, sql))
+            
+            # Start the most expensive queries first so that, under the
+            # concurrency cap, the slowest one isn't queued behind cheap ones
+            jobs.sort(key=lambda job: job[0].estimated_cost, reverse=True)
+            
+            semaphore = asyncio.Semaphore(settings.max_test_query_concurrency)
+            
+            async def run_test(test, sql: str) -> TestResult:
+                async with semaphore:
+                    return await self._run_predefined_test(test, sql, table_version)
+            
+            async def run_row_tests() -> List[TestResult]:
+                if not row_tests:
+                    return []
+                async with semaphore:
+                    return await self._run_row_tests(table_source(test_config), row_tests, table_version)
+            
+            async def run_query_tests() -> List[TestResult]:
+                if len(jobs) > 1:
+                    async with semaphore:
+                        results = await self._run_batched_tests(jobs, table_version)
+                    if results is not None:
+                        return results
+                return list(await asyncio.gather(*(run_test(test, sql) for test, sql in jobs)))
+            
+            row_results, job_results = await asyncio.gather(run_row_tests(), run_query_tests())
+            # Report in the order the tests were enabled
+            results_by_id = {result.test_id: result for result in [*row_results, *job_results]}
+            predefined_results.extend(
+                results_by_id[test.id] for test in enabled_tests if test.id in results_by_id
+            )
             
             # Generate AI suggestions if enabled
             ai_suggestions = []
             if mapping.get('auto_suggest', True):
                 try:
-                    gcs_sample = await gcs_service.sample_csv_data(source_bucket, actual_file_path, 5)
-                    bq_sample = await bigquery_service.get_sample_data(full_table_name, 5)
+                    gcs_sample, bq_sample = await asyncio.gather(
+                        gcs_service.sample_csv_data(source_bucket, actual_file_path, PROMPT_SAMPLE_ROWS),
+                        bigquery_service.get_sample_data(full_table_name, PROMPT_SAMPLE_ROWS)
+                    )
                     
                     existing_test_names = [test.name for test in enabled_tests]
                     
@@ -156,12 +266,10 @@ class TestExecutor:
                         existing_tests=existing_test_names
                     )
                     
-                    ai_suggestions = [
-                        AISuggestion(**suggestion)
-                        for suggestion in suggestions
-                    ]
-                except Exception as e:
-                    logger.error(f"Failed to generate AI suggestions for {mapping_id}: {str(e)}")
+                    # Model output is untrusted, so it is still validated (in one pass)
+                    ai_suggestions = _ai_suggestions_adapter.validate_python(suggestions)
+                except Exception:
+                    logger.exception("Failed to generate AI suggestions for %s", mapping_id)
             
             return MappingResult(
                 mapping_id=mapping_id,
@@ -176,7 +284,7 @@ class TestExecutor:
             )
             
         except Exception as e:
-            logger.error(f"Error processing mapping {mapping_id}: {str(e)}")
+            logger.exception("Error processing mapping %s", mapping_id)
             return MappingResult(
                 mapping_id=mapping_id,
                 predefined_results=[],
@@ -184,6 +292,320 @@ class TestExecutor:
                 error=str(e)
             )
     
+    @staticmethod
+    def _build_test_config(
+        mapping: Dict[str, Any],
+        full_table_name: str,
+        target_table: str,
+        table_metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Build the configuration predefined tests generate their SQL from.
+        
+        Columns not configured on the mapping are inferred from the schema.
+        
+        Args:
+            mapping: Mapping configuration dictionary
+            full_table_name: Fully qualified target table name
+            target_table: Target table ID
+            table_metadata: Target table metadata
+            
+        Returns:
+            Test configuration dictionary
+            
+        Raises:
+            ValueError: If a name, range bound or pattern set on the mapping isn't safe to embed in SQL
+        """
+        primary_keys = mapping.get('primary_key_columns')
+        required = mapping.get('required_columns')
+        outliers = mapping.get('outlier_columns')
+        
+        # Infer missing column roles from the schema in a single pass
+        pk_names = {'id', 'key', 'uuid', 'guid', f"{target_table}_id"}
+        pk_inferred, required_inferred, outlier_inferred = [], [], []
+        fields = table_metadata['schema']['fields'] if not (primary_keys and required and outliers) else ()
+        for col in fields:
+            name = col['name']
+            if name.lower() in pk_names:
+                pk_inferred.append(name)
+            if col['mode'] == 'REQUIRED':
+                required_inferred.append(name)
+            if col['type'] in _NUMERIC_TYPES:
+                outlier_inferred.append(name)
+        
+        config = {
+            'full_table_name': full_table_name,
+            'primary_key_columns': primary_keys or pk_inferred,
+            'required_columns': required or required_inferred,
+            'date_columns': mapping.get('date_columns', []),
+            'numeric_range_checks': _as_dict(mapping.get('numeric_range_checks')),
+            'date_range_checks': _as_dict(mapping.get('date_range_checks')),
+            'foreign_key_checks': _as_dict(mapping.get('foreign_key_checks')),
+            'pattern_checks': _as_dict(mapping.get('pattern_checks')),
+            'outlier_columns': outliers or outlier_inferred,
+            'partition_column': mapping.get('partition_column'),
+            'partition_start': (
+                partition_start_literal(
+                    mapping['partition_start'],
+                    _column_type(table_metadata, mapping.get('partition_column'))
+                ) if mapping.get('partition_start') else None
+            )
+        }
+        # Only the names the mapping supplies are checked; inferred columns
+        # come from the table's own schema, where flexible names are legal
+        check_test_config({
+            **config,
+            'primary_key_columns': primary_keys,
+            'required_columns': required,
+            'outlier_columns': outliers
+        })
+        return config
+    
+    @staticmethod
+    async def _lookup_table(
+        project_id: str,
+        dataset_id: str,
+        table_id: str
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Get a target table's row count and metadata.
+        
+        get_row_count fetches the table fresh and refreshes the cached
+        metadata, so the metadata lookup after it is normally served from
+        memory and reflects the table's current version.
+        
+        Args:
+            project_id: GCP project ID
+            dataset_id: Dataset ID
+            table_id: Table ID
+            
+        Returns:
+            (row count, table metadata)
+        """
+        row_count = await bigquery_service.get_row_count(f"{project_id}.{dataset_id}.{table_id}")
+        table_metadata = await bigquery_service.get_table_metadata(project_id, dataset_id, table_id)
+        return row_count, table_metadata
+    
+    @staticmethod
+    def _load_failed(file_row_count: int, bq_row_count: int) -> bool:
+        """
+        Whether row counts show the load failed outright, per
+        catastrophic_diff_threshold (never, when it isn't set).
+        
+        Args:
+            file_row_count: Rows in the source file
+            bq_row_count: Rows in the target table
+            
+        Returns:
+            True if the mapping's query tests should be skipped
+        """
+        threshold = settings.catastrophic_diff_threshold
+        if threshold is None:
+            return False
+        return (
+            file_row_count == 0
+            or bq_row_count == 0
+            or abs(file_row_count - bq_row_count) / max(file_row_count, 1) > threshold
+        )
+    
+    async def _count_file_rows(self, bucket_name: str, file_path: str) -> int:
+        """
+        Count data rows in a CSV file, in BigQuery when enabled.
+        
+        Args:
+            bucket_name: GCS bucket name
+            file_path: Path to CSV file
+            
+        Returns:
+            Number of rows (excluding header)
+        """
+        if settings.count_csv_with_bigquery:
+            try:
+                return await bigquery_service.count_gcs_csv_rows(f"gs://{bucket_name}/{file_path}")
+            except Exception as e:
+                logger.warning("Counting gs://%s/%s in BigQuery failed, streaming it instead: %s", bucket_name, file_path, e)
+        return await gcs_service.count_csv_rows(bucket_name, file_path)
+    
+    async def _cached_result(
+        self,
+        sql: str,
+        table_version: Optional[str],
+        run: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return run()'s result, sharing it with identical SQL already running
+        and reusing one from an earlier run against the same table version.
+        
+        Args:
+            sql: SQL the result is for
+            table_version: Target table's last modified time; results are only
+                cached when it is given
+            run: Coroutine function producing the result
+            
+        Returns:
+            The (possibly shared or cached) result
+        """
+        digest = hashlib.sha1(sql.encode()).hexdigest()
+        cache_key = (digest, table_version) if table_version else None
+        if cache_key:
+            result = self._query_cache.get(cache_key)
+            if result is not None:
+                return result
+        
+        # Concurrent mappings over one table often issue the same test SQL;
+        # only the first caller runs it and the rest await its result
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(run())
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        # Shielded so one waiter being cancelled doesn't cancel the others
+        result = await asyncio.shield(task)
+        
+        if cache_key:
+            self._query_cache[cache_key] = result
+        return result
+    
+    @staticmethod
+    def _test_result(test, sql: str, row_count: int) -> TestResult:
+        """Build the result of a test query; any failing row counts as a failure."""
+        return TestResult.model_construct(
+            test_id=test.id,
+            test_name=test.name,
+            category=test.category,
+            description=test.description,
+            status='PASS' if row_count == 0 else 'FAIL',
+            severity=test.severity,
+            sql_query=sql,
+            rows_affected=row_count,
+            error_message=None
+        )
+    
+    async def _run_predefined_test(
+        self,
+        test,
+        sql: str,
+        table_version: Optional[str] = None,
+        count_sql: Optional[str] = None
+    ) -> TestResult:
+        """
+        Run one predefined test query; any returned row counts as a failure.
+        
+        Args:
+            test: Predefined test template
+            sql: Generated SQL for the test
+            table_version: Target table's last modified time; when given, a
+                result from an earlier run against the same version is reused
+            count_sql: Query returning the failing row count as failing_rows,
+                run instead of counting the rows sql returns
+            
+        Returns:
+            TestResult, with ERROR status if the query failed
+        """
+        async def count_rows() -> int:
+            if count_sql:
+                return int((await bigquery_service.execute_query(count_sql))[0]['failing_rows'])
+            return len(await bigquery_service.execute_query(sql))
+        
+        try:
+            row_count = await self._cached_result(count_sql or sql, table_version, count_rows)
+            return self._test_result(test, sql, row_count)
+        except Exception as e:
+            return TestResult.model_construct(
+                test_id=test.id,
+                test_name=test.name,
+                category=test.category,
+                description=test.description,
+                status='ERROR',
+                severity=test.severity,
+                sql_query=sql,
+                rows_affected=0,
+                error_message=str(e)
+            )
+    
+    async def _run_row_tests(
+        self,
+        source: str,
+        row_tests: List[Tuple[Any, str, str]],
+        table_version: Optional[str] = None
+    ) -> List[TestResult]:
+        """
+        Count failing rows for several row-level tests in a single table scan.
+        
+        If the combined query fails, each test's failing rows are counted on
+        their own so that only the broken one reports an error; like the
+        combined count, these counts aren't capped by the tests' LIMIT.
+        
+        Args:
+            source: FROM clause source of the table the tests check
+            row_tests: (test, sql, predicate) for each row-level test
+            table_version: Target table's last modified time, for the result cache
+            
+        Returns:
+            TestResult per test, in the given order
+        """
+        sql = "SELECT\n" + ",\n".join(
+            f"    COUNTIF({predicate}) AS {test.id}" for test, _, predicate in row_tests
+        ) + f"\nFROM {source}"
+        
+        async def count_failing_rows() -> Dict[str, int]:
+            row = (await bigquery_service.execute_query(sql))[0]
+            return {test.id: int(row[test.id]) for test, _, _ in row_tests}
+        
+        try:
+            counts = await self._cached_result(sql, table_version, count_failing_rows)
+        except Exception as e:
+            logger.warning(
+                "Combined test query on %s failed, running tests separately: %s",
+                source, e
+            )
+            return list(await asyncio.gather(*(
+                self._run_predefined_test(
+                    test, test_sql, table_version,
+                    count_sql=f"SELECT COUNT(*) AS failing_rows FROM {source} WHERE {predicate}"
+                )
+                for test, test_sql, predicate in row_tests
+            )))
+        
+        return [
+            self._test_result(test, test_sql, counts[test.id])
+            for test, test_sql, _ in row_tests
+        ]
+    
+    async def _run_batched_tests(
+        self,
+        jobs: List[Tuple[Any, str]],
+        table_version: Optional[str] = None
+    ) -> Optional[List[TestResult]]:
+        """
+        Count the rows each test query returns, all in one BigQuery job.
+        
+        Args:
+            jobs: (test, sql) for each test
+            table_version: Target table's last modified time, for the result cache
+            
+        Returns:
+            TestResult per test in the given order, or None if the combined
+            job failed and the tests should be run one by one
+        """
+        sql = "\nUNION ALL\n".join(
+            f"SELECT '{test.id}' AS test_id, COUNT(*) AS failing_rows FROM ({test_sql})"
+            for test, test_sql in jobs
+        )
+        
+        async def count_result_rows() -> Dict[str, int]:
+            rows = await bigquery_service.execute_query(sql)
+            counts = {row['test_id']: int(row['failing_rows']) for row in rows}
+            return {test.id: counts[test.id] for test, _ in jobs}
+        
+        try:
+            counts = await self._cached_result(sql, table_version, count_result_rows)
+        except Exception as e:
+            logger.warning("Batched test query failed, running tests separately: %s", e)
+            return None
+        
+        return [self._test_result(test, test_sql, counts[test.id]) for test, test_sql in jobs]
+    
     async def process_config_table(
         self,
         project_id: str,
@@ -202,52 +624,120 @@ class TestExecutor:
             Dictionary with summary and results by mapping
         """
         try:
-            # Read config table
-            mappings = await bigquery_service.read_config_table(
-                project_id, config_dataset, config_table
-            )
-            
-            if not mappings:
-                raise ValueError("No active mappings found in config table")
-            
-            # Process each mapping
-            results = []
-            for mapping in mappings:
-                result = await self.process_mapping(project_id, mapping)
-                results.append(result)
-            
-            # Calculate summary
-            total_tests = sum(len(r.predefined_results) for r in results)
-            passed = sum(
-                len([t for t in r.predefined_results if t.status == 'PASS'])
-                for r in results
-            )
-            failed = sum(
-                len([t for t in r.predefined_results if t.status == 'FAIL'])
-                for r in results
-            )
-            errors = sum(
-                len([t for t in r.predefined_results if t.status == 'ERROR'])
-                for r in results
-            )
-            total_suggestions = sum(len(r.ai_suggestions) for r in results)
+            mappings = await self._read_mappings(project_id, config_dataset, config_table)
+            results = list(await asyncio.gather(*self._start_mappings(project_id, mappings)))
             
             return {
-                'summary': {
-                    'total_mappings': len(results),
-                    'total_tests': total_tests,
-                    'passed': passed,
-                    'failed': failed,
-                    'errors': errors,
-                    'total_suggestions': total_suggestions
-                },
+                'summary': self.summarize_mappings(results),
                 'results_by_mapping': results
             }
             
-        except Exception as e:
-            logger.error(f"Error processing config table: {str(e)}")
+        except Exception:
+            logger.exception("Error processing config table")
             raise
-
+    
+    async def iter_config_table(
+        self,
+        project_id: str,
+        config_dataset: str,
+        config_table: str
+    ) -> AsyncIterator[MappingResult]:
+        """
+        Process all mappings from a config table, yielding each mapping's
+        result as soon as it finishes rather than in config table order.
+        
+        Closing the iterator early cancels the mappings still running.
+        
+        Args:
+            project_id: Google Cloud project ID
+            config_dataset: Config table dataset
+            config_table: Config table name
+            
+        Yields:
+            MappingResult for each mapping
+        """
+        mappings = await self._read_mappings(project_id, config_dataset, config_table)
+        tasks = self._start_mappings(project_id, mappings)
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    async def _read_mappings(
+        project_id: str,
+        config_dataset: str,
+        config_table: str
+    ) -> List[Dict[str, Any]]:
+        """Read the active mappings from a config table, requiring at least one."""
+        mappings = await bigquery_service.read_config_table(
+            project_id, config_dataset, config_table
+        )
+        if not mappings:
+            raise ValueError("No active mappings found in config table")
+        return mappings
+    
+    def _start_mappings(
+        self,
+        project_id: str,
+        mappings: List[Dict[str, Any]]
+    ) -> List[asyncio.Future]:
+        """
+        Start processing mappings concurrently, bounded to avoid flooding
+        BigQuery/GCS. A mapping that fails resolves to a MappingResult
+        carrying the error.
+        
+        Args:
+            project_id: Google Cloud project ID
+            mappings: Mapping configurations
+            
+        Returns:
+            One future per mapping, in mapping order
+        """
+        semaphore = asyncio.Semaphore(settings.max_mapping_concurrency)
+        
+        async def run(mapping: Dict[str, Any]) -> MappingResult:
+            async with semaphore:
+                try:
+                    return await self.process_mapping(project_id, mapping)
+                except Exception as e:
+                    return MappingResult(
+                        mapping_id=mapping.get('mapping_id', 'unknown'),
+                        predefined_results=[],
+                        ai_suggestions=[],
+                        error=str(e)
+                    )
+        
+        return [asyncio.ensure_future(run(mapping)) for mapping in mappings]
+    
+    @staticmethod
+    def summarize_mappings(results: List[MappingResult]) -> Dict[str, int]:
+        """
+        Summarize mapping results in a single pass.
+        
+        Args:
+            results: Results of the processed mappings
+            
+        Returns:
+            Dictionary matching ConfigTableSummary
+        """
+        status_counts = Counter()
+        total_suggestions = 0
+        for r in results:
+            status_counts.update(t.status for t in r.predefined_results)
+            total_suggestions += len(r.ai_suggestions)
+        
+        return {
+            'total_mappings': len(results),
+            'total_tests': status_counts.total(),
+            'passed': status_counts['PASS'],
+            'failed': status_counts['FAIL'],
+            'errors': status_counts['ERROR'],
+            'skipped': status_counts['SKIPPED'],
+            'total_suggestions': total_suggestions
+        }
 
     async def process_schema_validation(
         self,
@@ -268,19 +758,17 @@ class TestExecutor:
         """
         all_schemas = {}
         
-        # 1. Gather all schemas
-        for dataset_id in datasets:
-            try:
-                table_ids = await bigquery_service.get_tables_in_dataset(project_id, dataset_id)
-                for table_id in table_ids:
-                    try:
-                        full_name = f"{project_id}.{dataset_id}.{table_id}"
-                        metadata = await bigquery_service.get_table_metadata(project_id, dataset_id, table_id)
-                        all_schemas[full_name] = metadata['schema']
-                    except Exception as e:
-                        logger.warning(f"Skipping table {table_id}: {str(e)}")
-            except Exception as e:
-                logger.error(f"Error listing tables for {dataset_id}: {str(e)}")
+        # 1. Gather all schemas, scanning the datasets concurrently
+        dataset_tables = await asyncio.gather(
+            *(bigquery_service.get_tables_with_metadata(project_id, dataset_id) for dataset_id in datasets),
+            return_exceptions=True
+        )
+        for dataset_id, tables in zip(datasets, dataset_tables):
+            if isinstance(tables, Exception):
+                logger.error("Error listing tables for %s: %s", dataset_id, tables)
+                continue
+            for metadata in tables:
+                all_schemas[metadata['full_table_name']] = metadata['schema']
         
         if not all_schemas:
             logger.warning("No schemas found to validate.")
@@ -1,12 +1,75 @@
 """Vertex AI service for AI-powered test generation."""
+import asyncio
+import hashlib
 import json
+import logging
+import re
 from typing import List, Dict, Any
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
-import vertexai
+import orjson
+from cachetools import TTLCache
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# How long generated suggestions are reused for an identical prompt
+SUGGESTION_CACHE_TTL_SECONDS = 3600
+
+
+# Sample rows and characters per sample value included in prompts; a few
+# short rows show the data's shape at a fraction of the tokens
+PROMPT_SAMPLE_ROWS = 3
+PROMPT_VALUE_MAX_CHARS = 80
+
+
+# A markdown code fence wrapping a whole model response
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+
+# Decodes the first JSON value in a response that has prose around it
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _compact_schema(schema: Dict[str, Any]) -> str:
+    """Render a schema as `name:TYPE` pairs, with REQUIRED columns marked (R)."""
+    return ", ".join(
+        f"{field['name']}:{field['type']}{'(R)' if field.get('mode') == 'REQUIRED' else ''}"
+        for field in schema.get('fields', [])
+    )
+
+
+def _prompt_sample(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep the first few sample rows, truncating long string values."""
+    return [
+        {
+            key: value[:PROMPT_VALUE_MAX_CHARS] if isinstance(value, str) else value
+            for key, value in row.items()
+        }
+        for row in rows[:PROMPT_SAMPLE_ROWS]
+    ]
+
+
+def _compact_json(value: Any) -> str:
+    """Serialize a value for a prompt without indentation, which only costs tokens."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _parse_json_response(text: str) -> Any:
+    """
+    Parse a model response as JSON, dropping any markdown code fence.
+    
+    Responses that wrap the JSON in prose fall back to decoding the first
+    array or object in them, ignoring whatever follows it.
+    """
+    text = _FENCE_RE.sub('', text.strip())
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        starts = [i for i in (text.find('['), text.find('{')) if i >= 0]
+        if not starts:
+            raise
+        value, _ = _JSON_DECODER.raw_decode(text, min(starts))
+        return value
+
 
 class VertexAIService:
     """Service for Vertex AI operations."""
@@ -14,15 +77,34 @@ class VertexAIService:
     def __init__(self):
         """Initialize Vertex AI service."""
         self.model = None
-
-    def _ensure_model(self):
-        """Ensure model is initialized."""
-        if not self.model:
-            vertexai.init(
-                project=settings.google_cloud_project,
-                location=settings.vertex_ai_location
-            )
-            self.model = GenerativeModel(settings.vertex_ai_model)
+        self._init_lock = asyncio.Lock()
+        # Prompt digest -> suggestions, so identical mappings (same table,
+        # schema, samples and tests) don't pay for another model call
+        self._suggestion_cache = TTLCache(maxsize=1024, ttl=SUGGESTION_CACHE_TTL_SECONDS)
+
+    async def _ensure_model(self):
+        """Ensure model is initialized, once, even under concurrent callers."""
+        if self.model:
+            return
+        async with self._init_lock:
+            if not self.model:
+                # The SDK import and init block, so they run off the event loop
+                loop = asyncio.get_running_loop()
+                self.model = await loop.run_in_executor(None, self._load_model)
+    
+    @staticmethod
+    def _load_model():
+        """Import the SDK, initialize it and create the configured model."""
+        # Imported lazily: the Vertex AI SDK dominates cold-start import
+        # time and is only needed once an AI feature is used.
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+
+        vertexai.init(
+            project=settings.google_cloud_project,
+            location=settings.vertex_ai_location
+        )
+        return GenerativeModel(settings.vertex_ai_model)
     
     async def generate_test_suggestions(
         self,
@@ -56,9 +138,9 @@ You are a data quality expert analyzing a data pipeline.
 - Mapping: {mapping_id}
 - Source: {source_info}
 - Target: {target_table}
-- Schema: {json.dumps(bq_schema, indent=2)}
-- GCS Sample: {json.dumps(gcs_sample[:5], indent=2, default=str)}
-- BigQuery Sample: {json.dumps(bq_sample[:5], indent=2, default=str)}
+- Schema (name:type, (R) = REQUIRED): {_compact_schema(bq_schema)}
+- GCS Sample: {_compact_json(_prompt_sample(gcs_sample))}
+- BigQuery Sample: {_compact_json(_prompt_sample(bq_sample))}
 
 **Predefined Tests Already Running:**
 {chr(10).join(f'- {test}' for test in existing_tests)}
@@ -82,18 +164,20 @@ CRITICAL: Use the full table name `{target_table}` in all SQL queries.
 Return ONLY a JSON array of 3-5 suggestions. No markdown formatting.
 """
         
+        cache_key = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+        cached = self._suggestion_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
-            self._ensure_model()
-            response = self.model.generate_content(prompt)
-            text = response.text
-            
-            # Clean up markdown formatting if present
-            text = text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
-            
-            # Parse JSON
-            suggestions = json.loads(text)
+            await self._ensure_model()
+            response = await self.model.generate_content_async(prompt)
+            suggestions = _parse_json_response(response.text)
+            if not isinstance(suggestions, list):
+                return []
             
-            return suggestions if isinstance(suggestions, list) else []
+            self._suggestion_cache[cache_key] = suggestions
+            return list(suggestions)
             
         except Exception as e:
             print(f"Failed to generate AI suggestions: {str(e)}")
@@ -120,8 +204,8 @@ You are a data architect validating a database implementation against a design.
 **Design Description (ERD):**
 {erd_description}
 
-**Actual Implemented Schemas (BigQuery):**
-{json.dumps(actual_schemas, indent=2)}
+**Actual Implemented Schemas (BigQuery, name:type, (R) = REQUIRED):**
+{chr(10).join(f'- {table}: {_compact_schema(schema)}' for table, schema in actual_schemas.items())}
 
 **Your Task:**
 Compare the actual implementation against the design. Identify:
@@ -141,11 +225,15 @@ For each check, provide:
 Return ONLY a JSON array of findings. No markdown.
 """
         try:
-            self._ensure_model()
-            response = self.model.generate_content(prompt)
-            text = response.text
-            text = text.replace('```json\\n', '').replace('```\\n', '').replace('```', '').strip()
-            return json.loads(text)
+            await self._ensure_model()
+            response = await self.model.generate_content_async(prompt)
+            findings = _parse_json_response(response.text)
+            # The prose fallback can yield a lone object; callers expect a
+            # list of finding dicts
+            if not isinstance(findings, list):
+                logger.warning("Schema validation response is not a JSON array; ignoring it")
+                return []
+            return [finding for finding in findings if isinstance(finding, dict)]
         except Exception as e:
             print(f"Failed to validate schema: {str(e)}")
             return []
@@ -1,10 +1,19 @@
 """Predefined test templates for data quality validation."""
-from typing import Dict, List, Callable, Optional
+import datetime
+import math
+import re
+from types import MappingProxyType
+from typing import Any, Dict, List, Callable, Optional, Sequence
 
 
 class TestTemplate:
     """Template for a predefined test."""
     
+    __slots__ = (
+        'id', 'name', 'category', 'severity', 'description', 'is_global',
+        'generate_predicate', 'generate_sql', 'estimated_cost'
+    )
+    
     def __init__(
         self,
         test_id: str,
@@ -13,7 +22,9 @@ class TestTemplate:
         severity: str,
         description: str,
         is_global: bool,
-        generate_sql: Callable[[Dict], Optional[str]]
+        generate_sql: Optional[Callable[[Dict], Optional[str]]] = None,
+        generate_predicate: Optional[Callable[[Dict], Optional[str]]] = None,
+        estimated_cost: int = 1000
     ):
         self.id = test_id
         self.name = name
@@ -21,11 +32,221 @@ class TestTemplate:
         self.severity = severity
         self.description = description
         self.is_global = is_global
-        self.generate_sql = generate_sql
+        # Row-level tests give a predicate for a failing row; their SQL
+        # selects matching rows, and the executor can count several at once
+        self.generate_predicate = generate_predicate
+        self.generate_sql = generate_sql or _matching_rows_sql(generate_predicate)
+        # Relative query cost, used to start the slowest queries first
+        self.estimated_cost = estimated_cost
+
+
+# Names embedded unquoted in test SQL: columns (optionally nested, a.b) and
+# table references (project IDs may contain dashes and a domain prefix)
+_COLUMN_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_.]*$')
+_TABLE_RE = re.compile(r'^[A-Za-z0-9_\-.:]+$')
+
+# Config entries holding column lists, and checks keyed by column
+_COLUMN_LIST_KEYS = ('primary_key_columns', 'required_columns', 'date_columns', 'outlier_columns')
+_COLUMN_CHECK_KEYS = ('numeric_range_checks', 'date_range_checks', 'pattern_checks', 'foreign_key_checks')
+
+
+def check_test_config(config: Dict) -> None:
+    """
+    Ensure every table and column name, range bound and pattern in a test
+    config is safe to embed in SQL; checked once per config, before any
+    test SQL is generated.
+    
+    Args:
+        config: Test configuration
+        
+    Raises:
+        ValueError: If a name isn't a plain identifier, a bound isn't a
+            number or date, or a pattern isn't a string
+    """
+    columns = [name for key in _COLUMN_LIST_KEYS for name in config.get(key) or ()]
+    columns.extend(name for key in _COLUMN_CHECK_KEYS for name in config.get(key) or ())
+    tables = [config['full_table_name']]
+    for ref in (config.get('foreign_key_checks') or {}).values():
+        columns.append(ref['column'])
+        tables.append(ref['table'])
+    if config.get('partition_column'):
+        columns.append(config['partition_column'])
+    
+    for name in columns:
+        if not isinstance(name, str) or not _COLUMN_RE.match(name):
+            raise ValueError(f"Invalid column name in test config: {name!r}")
+    for name in tables:
+        if not isinstance(name, str) or not _TABLE_RE.match(name):
+            raise ValueError(f"Invalid table reference in test config: {name!r}")
+    
+    # Rendering the literals validates them
+    for bounds in (config.get('numeric_range_checks') or {}).values():
+        _range_bounds(bounds, 'min', 'max', _number_literal)
+    for bounds in (config.get('date_range_checks') or {}).values():
+        _range_bounds(bounds, 'min_date', 'max_date', _date_literal)
+    for pattern in (config.get('pattern_checks') or {}).values():
+        _string_literal(pattern)
+
+
+def _range_bounds(
+    bounds: Any, low_key: str, high_key: str, render: Callable[[Any], str]
+) -> tuple:
+    """Render a range check's low and high bounds as SQL literals."""
+    if not isinstance(bounds, dict):
+        raise ValueError(f"Invalid range check in test config: {bounds!r}")
+    return render(bounds.get(low_key)), render(bounds.get(high_key))
+
+
+def _number_literal(value: Any) -> str:
+    """Render a configured numeric bound as a SQL number literal."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid numeric bound in test config: {value!r}")
+    if isinstance(value, int):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid numeric bound in test config: {value!r}")
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def _date_literal(value: Any) -> str:
+    """Render a configured date or datetime as a quoted SQL literal."""
+    parsed = _parse_date_value(value, 'date bound')
+    if isinstance(parsed, datetime.datetime):
+        return f"'{parsed.isoformat(sep=' ')}'"
+    return f"'{parsed.isoformat()}'"
+
+
+def _string_literal(value: Any) -> str:
+    """Render a configured string (e.g. a regex) as a quoted, escaped SQL literal."""
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid pattern in test config: {value!r}")
+    escaped = (
+        value.replace('\\', '\\\\').replace("'", "\\'")
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+    return f"'{escaped}'"
+
+
+def _parse_date_value(value: Any, setting: str) -> datetime.date:
+    """Parse a configured date or datetime (or its ISO 8601 text)."""
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Invalid {setting} in test config: {value!r}") from None
+
+
+def partition_start_literal(value: Any, column_type: Optional[str] = None) -> str:
+    """
+    Render a configured partition start as a SQL literal matching the
+    partition column's type.
+    
+    The value is parsed and re-rendered rather than embedded as given, so
+    only an ISO date or datetime can reach the SQL. A time part is dropped
+    for a DATE column (the start's whole day is included) and midnight is
+    assumed for a DATETIME or TIMESTAMP column given a plain date.
+    
+    Args:
+        value: Date, datetime or ISO 8601 string
+        column_type: BigQuery type of the partition column, if known
+        
+    Returns:
+        Typed literal, or a plain quoted one for an unknown column type
+        
+    Raises:
+        ValueError: If the value isn't a date or datetime
+    """
+    start = _parse_date_value(value, 'partition_start')
+    if column_type == 'DATE':
+        if isinstance(start, datetime.datetime):
+            start = start.date()
+        return f"DATE '{start.isoformat()}'"
+    if column_type in ('DATETIME', 'TIMESTAMP'):
+        if not isinstance(start, datetime.datetime):
+            start = datetime.datetime.combine(start, datetime.time())
+        if column_type == 'DATETIME':
+            start = start.replace(tzinfo=None)
+        return f"{column_type} '{start.isoformat(sep=' ')}'"
+    return _date_literal(start)
+
+
+def table_source(config: Dict) -> str:
+    """
+    FROM clause source for a test's target table.
+    
+    With a partition start configured this is a filtered subquery, so
+    BigQuery prunes the partitions before it instead of scanning them.
+    The start is already a literal, rendered by partition_start_literal
+    when the config was built.
+    """
+    table = f"`{config['full_table_name']}`"
+    if config.get('partition_column') and config.get('partition_start'):
+        return f"(SELECT * FROM {table} WHERE {config['partition_column']} >= {config['partition_start']})"
+    return table
+
+
+def _matching_rows_sql(
+    generate_predicate: Callable[[Dict], Optional[str]]
+) -> Callable[[Dict], Optional[str]]:
+    """Build a generate_sql that selects up to 100 rows matching a predicate."""
+    def generate_sql(config: Dict) -> Optional[str]:
+        predicate = generate_predicate(config)
+        return (
+            f"""
+            SELECT * FROM {table_source(config)}
+            WHERE {predicate}
+            LIMIT 100
+            """ if predicate else None
+        )
+    return generate_sql
+
+
+def _duplicate_keys_sql(config: Dict) -> Optional[str]:
+    """Select primary key values occurring more than once, joining the key list once."""
+    if not config.get('primary_key_columns'):
+        return None
+    keys = ', '.join(config['primary_key_columns'])
+    return f"""
+            SELECT {keys}, COUNT(*) as duplicate_count
+            FROM {table_source(config)}
+            GROUP BY {keys}
+            HAVING COUNT(*) > 1
+            """
+
+
+def _outlier_sql(config: Dict) -> Optional[str]:
+    """Select rows more than 3 standard deviations from the first outlier column's mean."""
+    if not config.get('outlier_columns'):
+        return None
+    col = config['outlier_columns'][0]
+    table = table_source(config)
+    return f"""
+            WITH stats AS (
+                SELECT 
+                    AVG({col}) as mean,
+                    STDDEV({col}) as stddev
+                FROM {table}
+                WHERE {col} IS NOT NULL
+            )
+            SELECT t.* 
+            FROM {table} t, stats
+            WHERE ABS(t.{col} - stats.mean) > 3 * stats.stddev
+            LIMIT 100
+            """
 
 
 # Predefined test templates
-PREDEFINED_TESTS = {
+_PREDEFINED_TESTS = {
     'row_count_match': TestTemplate(
         test_id='row_count_match',
         name='Row Count Match',
@@ -43,12 +264,9 @@ PREDEFINED_TESTS = {
         severity='HIGH',
         description='Check required columns have no NULL values',
         is_global=True,
-        generate_sql=lambda config: (
-            f"""
-            SELECT * FROM `{config['full_table_name']}`
-            WHERE {' OR '.join(f"{col} IS NULL" for col in config.get('required_columns', []))}
-            LIMIT 100
-            """ if config.get('required_columns') else None
+        generate_predicate=lambda config: (
+            ' OR '.join([f"{col} IS NULL" for col in columns])
+            if (columns := config.get('required_columns')) else None
         )
     ),
     
@@ -59,14 +277,8 @@ PREDEFINED_TESTS = {
         severity='HIGH',
         description='Ensure primary key uniqueness',
         is_global=True,
-        generate_sql=lambda config: (
-            f"""
-            SELECT {', '.join(config['primary_key_columns'])}, COUNT(*) as duplicate_count
-            FROM `{config['full_table_name']}`
-            GROUP BY {', '.join(config['primary_key_columns'])}
-            HAVING COUNT(*) > 1
-            """ if config.get('primary_key_columns') else None
-        )
+        estimated_cost=2000,
+        generate_sql=_duplicate_keys_sql
     ),
     
     'referential_integrity': TestTemplate(
@@ -76,23 +288,23 @@ PREDEFINED_TESTS = {
         severity='HIGH',
         description='Validate foreign key relationships',
         is_global=False,
+        estimated_cost=5000,
         generate_sql=lambda config: (
             ' UNION ALL '.join([
                 f"""
                 SELECT 
                     '{fk_col}' as fk_column, 
-                    {fk_col} as invalid_value,
+                    t.{fk_col} as invalid_value,
                     COUNT(*) as occurrence_count
-                FROM `{config['full_table_name']}` t
-                WHERE {fk_col} IS NOT NULL
-                AND NOT EXISTS (
-                    SELECT 1 FROM `{ref['table']}` r
-                    WHERE r.{ref['column']} = t.{fk_col}
-                )
-                GROUP BY {fk_col}
+                FROM {table_source(config)} t
+                LEFT JOIN `{ref['table']}` r
+                    ON r.{ref['column']} = t.{fk_col}
+                WHERE t.{fk_col} IS NOT NULL
+                AND r.{ref['column']} IS NULL
+                GROUP BY t.{fk_col}
                 """
-                for fk_col, ref in config.get('foreign_key_checks', {}).items()
-            ]) if config.get('foreign_key_checks') else None
+                for fk_col, ref in checks.items()
+            ]) if (checks := config.get('foreign_key_checks')) else None
         )
     ),
     
@@ -103,15 +315,12 @@ PREDEFINED_TESTS = {
         severity='MEDIUM',
         description='Check numeric values are within expected ranges',
         is_global=False,
-        generate_sql=lambda config: (
-            f"""
-            SELECT * FROM `{config['full_table_name']}`
-            WHERE {' OR '.join(
-                f"({col} < {range_val['min']} OR {col} > {range_val['max']})"
-                for col, range_val in config.get('numeric_range_checks', {}).items()
-            )}
-            LIMIT 100
-            """ if config.get('numeric_range_checks') else None
+        generate_predicate=lambda config: (
+            ' OR '.join([
+                f"({col} < {low} OR {col} > {high})"
+                for col, range_val in checks.items()
+                for low, high in [_range_bounds(range_val, 'min', 'max', _number_literal)]
+            ]) if (checks := config.get('numeric_range_checks')) else None
         )
     ),
     
@@ -122,15 +331,12 @@ PREDEFINED_TESTS = {
         severity='MEDIUM',
         description='Validate dates are within expected range',
         is_global=False,
-        generate_sql=lambda config: (
-            f"""
-            SELECT * FROM `{config['full_table_name']}`
-            WHERE {' OR '.join(
-                f"({col} < '{range_val['min_date']}' OR {col} > '{range_val['max_date']}')"
-                for col, range_val in config.get('date_range_checks', {}).items()
-            )}
-            LIMIT 100
-            """ if config.get('date_range_checks') else None
+        generate_predicate=lambda config: (
+            ' OR '.join([
+                f"({col} < {low} OR {col} > {high})"
+                for col, range_val in checks.items()
+                for low, high in [_range_bounds(range_val, 'min_date', 'max_date', _date_literal)]
+            ]) if (checks := config.get('date_range_checks')) else None
         )
     ),
     
@@ -141,15 +347,11 @@ PREDEFINED_TESTS = {
         severity='MEDIUM',
         description='Check string patterns (email, phone, etc.)',
         is_global=False,
-        generate_sql=lambda config: (
-            f"""
-            SELECT * FROM `{config['full_table_name']}`
-            WHERE {' OR '.join(
-                f"NOT REGEXP_CONTAINS(CAST({col} AS STRING), r'{pattern}')"
-                for col, pattern in config.get('pattern_checks', {}).items()
-            )}
-            LIMIT 100
-            """ if config.get('pattern_checks') else None
+        generate_predicate=lambda config: (
+            ' OR '.join([
+                f"NOT REGEXP_CONTAINS(CAST({col} AS STRING), {_string_literal(pattern)})"
+                for col, pattern in checks.items()
+            ]) if (checks := config.get('pattern_checks')) else None
         )
     ),
     
@@ -160,26 +362,21 @@ PREDEFINED_TESTS = {
         severity='LOW',
         description='Detect statistical outliers using standard deviation',
         is_global=False,
-        generate_sql=lambda config: (
-            f"""
-            WITH stats AS (
-                SELECT 
-                    AVG({config['outlier_columns'][0]}) as mean,
-                    STDDEV({config['outlier_columns'][0]}) as stddev
-                FROM `{config['full_table_name']}`
-                WHERE {config['outlier_columns'][0]} IS NOT NULL
-            )
-            SELECT t.* 
-            FROM `{config['full_table_name']}` t, stats
-            WHERE ABS(t.{config['outlier_columns'][0]} - stats.mean) > 3 * stats.stddev
-            LIMIT 100
-            """ if config.get('outlier_columns') else None
-        )
+        estimated_cost=5000,
+        generate_sql=_outlier_sql
     )
 }
 
 
-def get_enabled_tests(enabled_test_ids: Optional[List[str]] = None) -> List[TestTemplate]:
+# Read-only: the global test set below and the API's test listing are
+# computed from it once and never refreshed
+PREDEFINED_TESTS = MappingProxyType(_PREDEFINED_TESTS)
+
+# Tests run when a mapping doesn't choose any, in definition order
+_GLOBAL_TESTS = tuple(test for test in PREDEFINED_TESTS.values() if test.is_global)
+
+
+def get_enabled_tests(enabled_test_ids: Optional[List[str]] = None) -> Sequence[TestTemplate]:
     """
     Get enabled test templates.
     
@@ -187,14 +384,13 @@ def get_enabled_tests(enabled_test_ids: Optional[List[str]] = None) -> List[Test
         enabled_test_ids: List of test IDs to enable. If None, returns all global tests.
         
     Returns:
-        List of enabled test templates
+        Enabled test templates
     """
     if not enabled_test_ids:
         # Return all global tests by default
-        return [test for test in PREDEFINED_TESTS.values() if test.is_global]
+        return _GLOBAL_TESTS
     
     return [
-        PREDEFINED_TESTS[test_id]
-        for test_id in enabled_test_ids
-        if test_id in PREDEFINED_TESTS
+        test for test_id in enabled_test_ids
+        if (test := PREDEFINED_TESTS.get(test_id)) is not None
     ]
@@ -35,6 +35,8 @@ CREATE TABLE IF NOT EXISTS `miruna-sandpit.config.data_load_config` (
   foreign_key_checks JSON,            -- {"fk_column": {"table": "ref_table", "column": "ref_column"}}
   pattern_checks JSON,                -- {"email": "^[^@]+@[^@]+\\.[^@]+$"}
   outlier_columns ARRAY<STRING>,
+  partition_column STRING,            -- Only test rows where this column >= partition_start
+  partition_start STRING,             -- e.g. '2024-06-01'
   
   -- Enabled tests
   enabled_test_ids ARRAY<STRING>,     -- Which predefined tests to run
@@ -9,7 +9,7 @@ interface TestResult {
     description: string;
     sql_query: string;
     severity: string;
-    status: "PASS" | "FAIL" | "ERROR";
+    status: "PASS" | "FAIL" | "ERROR" | "SKIPPED";
     rows_affected?: number;
     error_message?: string;
 }
@@ -31,6 +31,7 @@ const COLORS = {
     PASS: "#10b981", // Green
     FAIL: "#ef4444", // Red
     ERROR: "#f59e0b", // Amber
+    SKIPPED: "#9ca3af", // Gray
 };
 
 export default function ResultsView() {
@@ -178,6 +179,14 @@ export default function ResultsView() {
                             </div>
                             <div style={{ color: 'var(--secondary-foreground)' }}>Errors</div>
                         </div>
+                        {summary.skipped > 0 && (
+                            <div className="card" style={{ textAlign: 'center' }}>
+                                <div style={{ fontSize: '2rem', fontWeight: '700', color: '#9ca3af' }}>
+                                    {summary.skipped}
+                                </div>
+                                <div style={{ color: 'var(--secondary-foreground)' }}>Tests Skipped</div>
+                            </div>
+                        )}
                         {summary.total_suggestions > 0 && (
                             <div className="card" style={{ textAlign: 'center' }}>
                                 <div style={{ fontSize: '2rem', fontWeight: '700', color: 'var(--primary)' }}>
@@ -195,6 +204,7 @@ export default function ResultsView() {
                         PASS: mapping.predefined_results.filter(r => r.status === 'PASS').length,
                         FAIL: mapping.predefined_results.filter(r => r.status === 'FAIL').length,
                         ERROR: mapping.predefined_results.filter(r => r.status === 'ERROR').length,
+                        SKIPPED: mapping.predefined_results.filter(r => r.status === 'SKIPPED').length,
                     };
 
                     return (
@@ -236,6 +246,11 @@ export default function ResultsView() {
                                         ⚠ {mappingStats.ERROR} Errors
                                     </div>
                                 )}
+                                {mappingStats.SKIPPED > 0 && (
+                                    <div style={{ padding: '0.5rem 1rem', background: '#f3f4f6', color: '#374151', borderRadius: 'var(--radius)', fontWeight: '600' }}>
+                                        ⏭ {mappingStats.SKIPPED} Skipped
+                                    </div>
+                                )}
                             </div>
 
                             {/* Test Results Table */}
@@ -354,12 +369,14 @@ export default function ResultsView() {
         PASS: results.filter((r) => r.status === "PASS").length,
         FAIL: results.filter((r) => r.status === "FAIL").length,
         ERROR: results.filter((r) => r.status === "ERROR").length,
+        SKIPPED: results.filter((r) => r.status === "SKIPPED").length,
     };
 
     const chartData = [
         { name: "Pass", value: stats.PASS },
         { name: "Fail", value: stats.FAIL },
         { name: "Error", value: stats.ERROR },
+        ...(stats.SKIPPED > 0 ? [{ name: "Skipped", value: stats.SKIPPED }] : []),
     ];
 
     return (
@@ -380,6 +397,12 @@ export default function ResultsView() {
                     <div style={{ fontSize: '2rem', fontWeight: '700', color: '#f59e0b' }}>{stats.ERROR}</div>
                     <div style={{ color: 'var(--secondary-foreground)' }}>Errors</div>
                 </div>
+                {stats.SKIPPED > 0 && (
+                    <div className="card" style={{ textAlign: 'center' }}>
+                        <div style={{ fontSize: '2rem', fontWeight: '700', color: '#9ca3af' }}>{stats.SKIPPED}</div>
+                        <div style={{ color: 'var(--secondary-foreground)' }}>Skipped</div>
+                    </div>
+                )}
             </div>
 
             {/* Pie Chart */}